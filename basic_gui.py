@@ -1,10 +1,9 @@
 ﻿from connection import serverCon
 from davitpy.pydarn.sdio.radDataTypes import beamData, scanData
-import matplotlib.pyplot as plot
-from radarPos import RadarPos
-import sys, datetime, pytz
-from davitpy.utils.plotUtils import genCmap,mapObj,geoLoc
-from davitpy.pydarn.radar import radFov
+from warmStart import loadBeams, warmPrefix
+from historyStore import readBeams, readDay, epoch
+from rtiRing import RtiRing, ringFile, ringSlots, RING_GATES
+import os, sys, datetime, pytz
 sys.path.append('~/davitpy')
 
 
@@ -19,13 +18,50 @@ class parseStart:
 	
 	def __init__(self,*args,**kwargs):
 		self.channels = []
+		self.format = ['json']
+		self.cadence = ['10.5']
+		self.coalesce = ['1','20']
+		self.staleness = ['60']
+		self.workers = ['3']
+		self.metrics = ['']
+		self.health = ['']
+		self.warm = ['']
+		self.verbose = ['0']
 		parseArgs(self)
 		if len(self.channels) == 0:
 			self.channels.append('')
+		if self.warm[0] and not os.path.isdir(self.warm[0]):
+			os.makedirs(self.warm[0])
 		
+		self.radars = []
+		for i in range(len(self.rad)):
+			self.radars.append(radarState(self,i))
+		for radar in self.radars:
+			createData(radar)
+			loadData(radar)
+		serverCon(self.radars)
+
+#arguments given per radar, a single value is used for every radar
+RADAR_ARGS = ('hosts','ports','names','beams','nrangs','maxbeam','channels','filepath','format','cadence')
+#arguments shared by every radar
+SHARED_ARGS = ('coalesce','staleness','workers','metrics','health','warm','verbose')
+
+'''
+Settings and state of one radar
+each list argument is cut down to the radar's own entry
+so the plotting and connection code keeps using index [0]
+'''
+class radarState:
+	
+	def __init__(self,parent,i):
+		for key in RADAR_ARGS:
+			vals = getattr(parent,key)
+			setattr(self,key,[vals[min(i,len(vals)-1)]])
+		for key in SHARED_ARGS:
+			setattr(self,key,getattr(parent,key))
 		
 		self.i = 0
-		self.rad = self.rad[0]
+		self.rad = parent.rad[i]
 		
 		self.maxbm = self.maxbeam[0]
 		self.fan = None
@@ -40,7 +76,6 @@ class parseStart:
 		self.data['drawEdge'] = False
 		self.data['gridColor']='k'
 		self.data['backgColor'] = 'w'
-		self.data['figure'] = 3*[plot.figure()]
 		self.fan = self.data
 	
 	
@@ -50,7 +85,6 @@ class parseStart:
 		self.data['sc'] = [[-1000,1000],[0,30],[0,500]]
 		self.data['gsct'] = True
 		self.data['drawEdge'] = False
-		self.data['figure'] = plot.figure()
 		self.time = self.data
 		
 	
@@ -67,11 +101,7 @@ class parseStart:
 		self.data['continentColor'] = 'w'
 		self.data['merColor'] = '0.75'
 		self.data['merGrid'] = True
-		self.data['figure'] = 3*[plot.figure()]
 		self.geo = self.data
-		createData(self)
-		loadData(self)
-		serverCon(self)
 		
 '''
 Starts the whole program
@@ -96,6 +126,24 @@ def parseArgs(self):
 			self.names = argL[indEq:].split(',')
 		elif 'streams' in argL:
 			self.streams = argL[indEq:].split(',')
+		elif 'format' in argL:
+			self.format = argL[indEq:].split(',')
+		elif 'coalesce' in argL:
+			self.coalesce = argL[indEq:].split(',')
+			if len(self.coalesce) == 1:
+				self.coalesce.append('20')
+		elif 'staleness' in argL:
+			self.staleness = argL[indEq:].split(',')
+		elif 'workers' in argL:
+			self.workers = argL[indEq:].split(',')
+		elif 'metrics' in argL:
+			self.metrics = argL[indEq:].split(',')
+		elif 'health' in argL:
+			self.health = argL[indEq:].split(',')
+		elif 'warm' in argL:
+			self.warm = argL[indEq:].split(',')
+		elif 'verbose' in argL:
+			self.verbose = argL[indEq:].split(',')
 		elif 'channels' in argL:
 			self.channels = argL[indEq:].split(',')
 		elif 'beams' in argL:
@@ -114,6 +162,8 @@ def parseArgs(self):
 			self.rad = argL[indEq:].split(',')
 		elif 'filepath' in argL:
 			self.filepath = argL[indEq:].split(',')
+		elif 'cadence' in argL:
+			self.cadence = argL[indEq:].split(',')
 	if len(sys.argv)==1:
 		self.hosts=['localhost']
 		self.ports=['6047']
@@ -131,7 +181,6 @@ datasets later updated by incoming data
 '''
 def createData(self):
 	self.myScan = scanData()
-	self.myBeamList = scanData()
 	for i in range(0, int(self.maxbm)):
 		myBeam = beamData()
 		today = datetime.datetime.utcnow()
@@ -142,32 +191,42 @@ def createData(self):
 		if i == 0:
 			self.myBeam = myBeam
 		self.myScan.append(myBeam)
-	self.site = RadarPos(code = self.rad)
-	self.site.tval = datetime.datetime.utcnow()
-	self.lon_0,self.lat_0, self.fovs,self.dist,self.width,self.height = \
-	geoLoc(self.site, int(self.nrangs[0]),self.site.rsep, int(self.maxbm))
-	self.myMap = mapObj(coords='geo',draw=True, projection='stere', lat_0=self.lat_0,\
-							lon_0=self.lon_0, width= self.width*1.2,
-							height = self.height*1.2,grid =True,anchor = 'N',
-							datetime=self.site.tval)
+	#beams saved by the previous run
+	if self.warm[0]:
+		for myBeam in loadBeams(warmPrefix(self, 'scan')):
+			if myBeam.bmnum < len(self.myScan):
+				self.myScan[myBeam.bmnum] = myBeam
+		self.myBeam = self.myScan[0]
 
 '''
 loadData(self) used for time plot data only 
-reads in the data file to allow the time plot to 
-have 24 hours worth of data
+opens the radar's RTI ring, which keeps the last 24 hours
+of the time plot beam across restarts, sized for the beam's
+cadence and at least nrangs gates. A new ring is filled
+from the history store, the beams from before the history
+store are read from the old text data files
 '''
 def loadData(self):
+	name = self.rad+self.channels[0]
+	self.ring = RtiRing(ringFile(name, int(self.beams[0])), ringSlots(float(self.cadence[0])),
+		max(RING_GATES, int(self.nrangs[0])))
+	if self.ring.count() > 0:
+		return
 	timeNow = datetime.datetime.utcnow()
 	timeThen = timeNow - datetime.timedelta(days=1)
+	myBeamList = readBeams(name, int(self.beams[0]), timeThen, timeNow)
 	currentTime = timeThen
 	while currentTime <= timeNow:
+		#a day the history store has only takes the old lines from before its first record
+		stored = readDay(name, currentTime.date(), int(self.beams[0]))[0]
+		firstStored = stored['time'][0] if len(stored) else None
 		dFilenm = 'data/'+`currentTime.month`+`currentTime.day`+`currentTime.year`+'_'+self.rad+self.channels[0]
 		try:
 			with open(dFilenm,'r+') as f:
 				for line in f:
 					spiltline = line.split(';')
 					beamTime = createDt(spiltline[1])
-					if beamTime > timeThen:
+					if beamTime > timeThen and (firstStored is None or epoch(beamTime) < firstStored):
 						myBeam = beamData()
 						myBeam.stid = int(spiltline[0])
 						myBeam.bmnum = int(self.beams[0])
@@ -186,12 +245,15 @@ def loadData(self):
 						myBeam.fit.p_l  = splitArray(spiltline[13])
 						myBeam.fit.w_l = splitArray(spiltline[14])
 						myBeam.fit.gflg = splitArray(spiltline[15])
-						self.myBeamList.append(myBeam)
+						myBeamList.append(myBeam)
 			
 				f.close()
 		except:
 			print dFilenm,'file doesn"t exist'
 		currentTime += datetime.timedelta(days=1)
+	myBeamList.sort(key=lambda myBeam: myBeam.time)
+	for myBeam in myBeamList:
+		self.ring.put(myBeam)
 
 '''
 splitArray(strArr) 
@@ -0,0 +1,58 @@
+# bounded buffers between the twisted client and the plotting threads
+# of connection.py, replacing unbounded Queues. When drawing falls
+# behind the twisted client keeps putting beams without ever blocking
+# and each buffer decides what to keep
+#   ScanState   - geo and fan plots (scanState.py), only the newest
+#                 beam of each beam number, older ones are coalesced away
+#   WindowBeams - time plot, every beam within a time window, up to a
+#                 maximum count, dropping the oldest
+# both count what they throw away in metrics.py counters
+
+import datetime
+from threading import Lock
+from collections import deque
+from metrics import Counter
+
+# beams kept for the time plot and how far back they may go
+MAX_WINDOW = 10000
+WINDOW = datetime.timedelta(days=1)
+
+class BeamBuffer(object):
+	def __init__(self, dropped = None, coalesced = None):
+		self.lock = Lock()
+		self.dropped = dropped if dropped is not None else Counter()
+		self.coalesced = coalesced if coalesced is not None else Counter()
+		self.logged = (0, 0)
+
+	'''
+	Dropped and coalesced beams since the previous call, for logging
+	'''
+	def losses(self):
+		now = (self.dropped.value, self.coalesced.value)
+		last = self.logged
+		self.logged = now
+		return now[0] - last[0], now[1] - last[1]
+
+'''
+Every beam within window of the newest, at most maxlen of them
+'''
+class WindowBeams(BeamBuffer):
+	def __init__(self, maxlen = MAX_WINDOW, window = WINDOW, **counters):
+		super(WindowBeams, self).__init__(**counters)
+		self.maxlen = maxlen
+		self.window = window
+		self.beams = deque()
+
+	def put(self, myBeam):
+		with self.lock:
+			self.beams.append(myBeam)
+			while len(self.beams) > self.maxlen or \
+					myBeam.time - self.beams[0].time > self.window:
+				self.beams.popleft()
+				self.dropped.inc()
+
+	def drain(self):
+		with self.lock:
+			beams = list(self.beams)
+			self.beams.clear()
+		return beams
@@ -0,0 +1,69 @@
+# raw dmap capture files with a time index
+# pydmap_daemon.py tees the upstream bytes of every radar into size
+# rotated <name>_<yyyymmdd.HHMMSS>.dmap files, each with a .idx file
+# holding the receive time and file offset of every chunk received.
+# dmap_replay.py serves them back at the recorded pace.
+
+import os
+import time
+import numpy as np
+
+# bytes written to a capture file before a new one is started
+CAPTURE_SIZE = 64 * 1024 * 1024
+
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('offset', '<u8')])
+
+class CaptureWriter(object):
+	def __init__(self, directory, name, maxsize = CAPTURE_SIZE):
+		self.directory = directory
+		self.name = name
+		self.maxsize = maxsize
+		self.data = None
+		self.index = None
+		self.size = 0
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+	def rotate(self, now):
+		self.close()
+		filenm = os.path.join(self.directory, '%s_%s' % \
+			(self.name, time.strftime('%Y%m%d.%H%M%S', time.gmtime(now))))
+		self.data = open(filenm + '.dmap', 'ab')
+		self.index = open(filenm + '.idx', 'ab')
+		self.size = os.path.getsize(filenm + '.dmap')
+
+	'''
+	Appends a chunk of raw bytes and its index entry
+	'''
+	def write(self, chunk, now):
+		if self.data is None or self.size >= self.maxsize:
+			self.rotate(now)
+		entry = np.array([(now, self.size)], dtype=INDEX_DTYPE)
+		self.data.write(chunk)
+		self.index.write(entry.tostring())
+		self.size += len(chunk)
+
+	def flush(self):
+		if self.data is not None:
+			self.data.flush()
+			self.index.flush()
+
+	def close(self):
+		if self.data is not None:
+			self.data.close()
+			self.index.close()
+		self.data = None
+		self.index = None
+
+'''
+Reads a capture file back as (receive time, chunk) pairs
+'''
+def readCapture(filenm):
+	if filenm.endswith('.dmap'):
+		filenm = filenm[:-len('.dmap')]
+	index = np.fromfile(filenm + '.idx', dtype=INDEX_DTYPE)
+	with open(filenm + '.dmap', 'rb') as f:
+		data = f.read()
+	ends = list(index['offset'][1:]) + [len(data)]
+	for entry, end in zip(index, ends):
+		yield entry['time'], data[int(entry['offset']):int(end)]
@@ -1,21 +1,28 @@
-﻿from davitpy.pydarn.sdio.radDataTypes import beamData, scanData
+﻿from davitpy.pydarn.sdio.radDataTypes import beamData
 import logging
 from twisted.internet import reactor, protocol
-from twisted.internet.protocol import ClientFactory
+from twisted.internet.protocol import ReconnectingClientFactory
+from twisted.protocols.basic import Int32StringReceiver
 import json
-from Queue import Queue 
+import os
+import signal
+import numpy
+from dmapframe import decodeFrame
+from jsonstream import JsonSplitter
+from scheduler import RenderScheduler, BEAM
+from renderPool import RenderPool, renderGeo, renderFan, renderTime, renderText, snapshotBeam, snapshotScan, plotOpts
+from beamBuffers import WindowBeams
+from scanState import ScanState
+from metrics import Registry
+from warmStart import saveWarm, WARM_INTERVAL
+from historyStore import appendBeams
+from rtiRing import RING_SECONDS
+from eventLog import logEvent, LogWriter
+from twisted.internet.task import LoopingCall
 from threading import Event, Thread
-from rtiJS import plotRti
-from geoJS import plotFan
-from fgpJS import plotFgpJson
-import matplotlib.pyplot as plot
-import sys,datetime,pytz
+import sys,datetime
 sys.path.append('~/davitpy')
-from davitpy.utils.plotUtils import genCmap,mapObj,geoLoc
 import time
-from davitpy.pydarn.proc.music import getDataSet
-from davitpy import utils
-import logging.config
 '''
 A thread that plots and saves the geographic fan plot
 and beam vs gates plot
@@ -24,11 +31,12 @@ class geoThread(Thread):
 	'''
 	Initialization of global variables
 	'''
-	def __init__(self, parent,data,timeQue):
+	def __init__(self, parent,data):
 		super(geoThread, self).__init__()
+		#a render still running after shutdown's join does not hold up the exit
+		self.daemon = True
 		self.parent = parent
 		self.data = data
-		self.tq = timeQue
 		self.oldCpid = -9999999999
 		self.maxgates = int(self.parent.nrangs[0])
 		self.stoprequest = Event()
@@ -46,127 +54,48 @@ class geoThread(Thread):
 	initial parameters 
 	'''	
 	def run(self):
-		while not self.data.empty():
-			myScan = self.data.get(True, 0.1)
-			for mb in myScan:
-				myBeam = beamData()
-				myBeam = mb
-				break
 		while not self.stoprequest.isSet():
-			time.sleep(1)
+			#blocks until a beam, scan end or staleness asks for a render
+			trig = self.parent.geoSched.wait()
+			if trig is None:
+				break
 			timeNow = datetime.datetime.utcnow()
+			myBeam = self.data.latest()
 			myBeam.time = myBeam.time.replace(tzinfo=None)	
 			tdif = timeNow - myBeam.time
 			if tdif.seconds > 360:
-				try:
-					reactor.stop()
-				except:
-					logging.error('Reactor already stopped')
-				self.tq.put(0)
-				logging.error('Geo thread stopped')
-				for pr in self.parent.fan['param']:
-					silentRemove(self,"fan_%s.png" % (pr))
-					silentRemove(self,"geo_%s.png" % (pr))
-				self.stoprequest.set()
-				break
-			while not self.data.empty():
-				myBeam = beamData()
-				myBeam = self.data.get()
+				#keeps waiting, the plots are redrawn once data comes back
+				markLost(self,'No data', seconds=tdif.seconds)
+				continue
+			#consistent copy of the scan, nothing to draw if no beam arrived
+			snap = self.data.snapshot()
+			if snap is None:
+				continue
+			self.parent.lost = False
+			myScan, changed, version = snap
+			for myBeam in changed:
 				if myBeam.cp != self.oldCpid:
 					self.oldCpid = myBeam.cp
 					self.parent.maxbm = self.parent.maxbeam[0]
-				#updates if maxgates is changing
+				#a new number of gates or beams changes the map the workers draw on
 				if myBeam.prm.nrang != self.maxgates:
-					logging.info('Changing Gates')
+					self.parent.logger.info('Changing Gates')
 					self.maxgates = myBeam.prm.nrang
-					self.parent.lon_0,self.parent.lat_0, self.parent.fovs,\
-					self.parent.dist, self.parent.height,self.parent.width = geoLoc(self.parent.site,\
-						self.maxgates,myBeam.prm.rsep,int(self.parent.maxbm))
-					self.parent.myMap = mapObj(coords='geo', projection='stere',\
-						lat_0=self.parent.lat_0, lon_0=self.parent.lon_0,\
-						width= self.parent.width*1.3,height = self.parent.height*1.3,\
-						grid =True)
-				#updates myScan size if the beam number is greater then the current myScan size
-				elif myBeam.bmnum >= len(myScan):
-					bmnum = len(myScan)
-					while myBeam.bmnum > len(myScan):
-						time.sleep(0.1)
-						tmp_myBeam = beamData()
-						tmp_myBeam.bmnum = bmnum
-						tmp_myBeam.time = timeNow.replace(tzinfo=None)
-						myScan.append(tmp_myBeam)
-						bmnum += 1
-					myScan.append(myBeam)
-					logging.info('Changing Beam number %s'%(myBeam))
+				if myBeam.bmnum >= int(self.parent.maxbm):
+					self.parent.logger.info('Changing Beam number %s'%(myBeam))
 					self.parent.maxbm = myBeam.bmnum+1
-					self.parent.lon_0,self.parent.lat_0, self.parent.fovs,\
-					self.parent.dist, self.parent.height,self.parent.width = geoLoc(self.parent.site,\
-						self.maxgates,myBeam.prm.rsep,\
-						int(self.parent.maxbm))
-					self.parent.myMap = mapObj(coords='geo', projection='stere',\
-						lat_0=self.parent.lat_0, lon_0=self.parent.lon_0,\
-						width= self.parent.width*1.3,height = self.parent.height*1.3,\
-						anchor = 'N',grid =True,draw=True)
-				else:
-					myScan.pop(myBeam.bmnum)
-					myScan.insert(myBeam.bmnum,myBeam)
-			#Plot and save geographic figure for each parameter
-			try:
-				self.parent.geo['figure'] = plotFan(myScan,[self.parent.rad],
-					fovs = self.parent.fovs,
-					params=self.parent.geo['param'],
-					gsct=self.parent.geo['gsct'], 
-					maxbeams = int(self.parent.maxbm),
-					maxgates=self.maxgates,	
-					scales=self.parent.geo['sc'],
-					drawEdge = self.parent.geo['drawEdge'], 
-					myFigs = self.parent.geo['figure'],
-					bmnum = myBeam.bmnum,
-					site = self.parent.site,
-					tfreq = myBeam.prm.tfreq,
-					noise = myBeam.prm.noisesearch,
-					nave = myBeam.prm.nave,
-					inttime = myBeam.prm.inttsc,
-					rTime=myBeam.time,
-					radN = self.parent.names[0],
-					dist = self.parent.dist,
-					merGrid = self.parent.geo['merGrid'],
-					merColor = self.parent.geo['merColor'],
-					continentBorder = self.parent.geo['continentBorder'],
-					waterColor = self.parent.geo['waterColor'],
-					continentColor = self.parent.geo['continentColor'],
-					backgColor = self.parent.geo['backgColor'],
-					gridColor = self.parent.geo['gridColor'],
-					filepath = self.parent.filepath[0],
-					myMap = self.parent.myMap)
-			except:
-				logging.error('geographic plot missing info')
-				logging.error('Geo Figure: %s'%(sys.exc_info()[0]))
-				
-			
-			#Plot and save beam number vs gates figure for each parameter
-			for i in range(len(self.parent.fan['figure'])):
-				time.sleep(1)
-				if self.parent.fan['param'][i] == 'velocity':
-					self.parent.fan['gsct'] = True
-				else:
-					self.parent.fan['gsct'] = False
-				try:
-					self.parent.fan['figure'][i].clf()
-					self.parent.fan['figure'][i]=plotFgpJson(myScan,self.parent.rad,
-						params=[self.parent.fan['param'][i]],
-						gsct=self.parent.fan['gsct'],
-						scales=[self.parent.fan['sc'][i]],
-						bmnum = myBeam.bmnum,
-						figure = self.parent.fan['figure'][i],
-						tfreq = myBeam.prm.tfreq,
-						noise = myBeam.prm.noisesearch,
-						rTime=myBeam.time,
-						radN = self.parent.names[0])
-					self.parent.fan['figure'][i].savefig("%sfan_%s" % (self.parent.filepath[0],self.parent.fan['param'][i]))
-				except:
-					logging.error('fan plot missing info')
-					logging.error('Fan Figure: %s'%(sys.exc_info()[0]))
+			logEvent(self.parent.logger, logging.DEBUG, 'scan', 'Drawing scan', version=version, changed=len(changed))
+			#Plot and save the geographic and beam number vs gates figures
+			#for each parameter in separate render processes
+			job = {'rad':self.parent.rad, 'name':self.parent.names[0],
+				'warm':self.parent.warm[0], 'filepath':self.parent.filepath[0], 'maxgates':self.maxgates,
+				'rsep':myBeam.prm.rsep, 'maxbeams':int(self.parent.maxbm),
+				'beam':snapshotBeam(myBeam), 'scan':snapshotScan(myScan)}
+			results = [self.parent.renderPool.submit(renderGeo, dict(job, opts=plotOpts(self.parent.geo))),
+				self.parent.renderPool.submit(renderFan, dict(job, opts=plotOpts(self.parent.fan)))]
+			for result in results:
+				logErrors(self.parent, result.get())
+			self.parent.geoSched.done(trig)
 					
 	
 	'''
@@ -174,7 +103,8 @@ class geoThread(Thread):
 	'''
 	def join(self, timeout=None):
 		self.stoprequest.set()
-		logging.info("Closing geoThread")
+		self.parent.geoSched.stop()
+		self.parent.logger.info("Closing geoThread")
 		super(geoThread, self).join(timeout)
 
 '''
@@ -187,73 +117,81 @@ class timeThread(Thread):
 	'''
 	def __init__(self, parent, data):
 		super(timeThread, self).__init__()
+		self.daemon = True
 		self.parent = parent
 		self.data = data
 		self.stoprequest = Event()
 	'''
 	Checks if queue is empty and uploads beam information
 	as long as stoprequest is not set.
-	Once new data is loaded and replaced into the my beam list
+	Once new data is written into the radar's RTI ring
 	the time plot is called and saved. 
 	'''		
 	def run(self):
-		myBeamList = scanData()
-		while not self.data.empty():
-			myBeamList = self.data.get(True, 0.01)
+		ring = self.parent.ring
+		clipped = ring.clipped
 		while not self.stoprequest.isSet():
-			time.sleep(20)
+			trig = self.parent.timeSched.wait()
+			if trig is None:
+				break
 			timeNow = datetime.datetime.utcnow()
-			while not self.data.empty():
-				tmpB = self.data.get(True, 0.01)
-				if tmpB == 0:
-					try:
-						reactor.stop()
-					except:
-						logging.error('Reactor already stopped')
-					logging.error('Time thread stopped')
-					self.stoprequest.set()
-					
-					sys.exit()
-					break
-				else:
-					myBeam = beamData()
-					myBeam = tmpB
-				#writes to a file so the beam data can be later uploaded
-				dFilenm = 'data/'+`timeNow.month`+`timeNow.day`+`timeNow.year`+'_'+self.parent.rad+self.parent.channels[0]
-				
-				with open(dFilenm,'a+') as f:
-					fLine = `myBeam.stid`+';'+`myBeam.time`+';'+`myBeam.cp`+';'+`myBeam.prm.nave`+\
-						';'+`myBeam.prm.noisesky`+';'+`myBeam.prm.rsep`+';'+`myBeam.prm.nrang`+\
-						';'+`myBeam.prm.frang`+';'+`myBeam.prm.noisesearch`+';'+`myBeam.prm.tfreq`+\
-						';'+`myBeam.fit.slist`+';'+`myBeam.prm.ifmode`+';'+`myBeam.fit.v`+';'+\
-						`myBeam.fit.p_l`+';'+`myBeam.fit.w_l`+';'+`myBeam.fit.gflg`+'\n'
-					f.write(fLine)
-				f.close()
-				myBeamList.append(myBeam)
-			if len(myBeamList)>2:
-				try:
-					self.parent.time['figure'].clf()
-					self.parent.time['figure']=plotRti(myBeamList,
-							self.parent.rad,
-							params=self.parent.time['param'],
-							scales=self.parent.time['sc'],
-							gsct=self.parent.time['gsct'],
-							bmnum = int(self.parent.beams[0]),
-							figure = self.parent.time['figure'],
-							rTime = timeNow,
-							title = self.parent.names[0],
-							myFov = self.parent.fovs)
-					self.parent.time['figure'].savefig("%stime" % (self.parent.filepath[0]))
-				except:
-					logging.error('time plot missing info')
-					logging.error('Time Figure: %s' %(sys.exc_info()[0]))
+			beams = self.data.drain()
+			#appends to the history store so the beam data can be later loaded
+			appendBeams(self.parent.rad+self.parent.channels[0], beams)
+			bmnum = int(self.parent.beams[0])
+			for myBeam in beams:
+				if myBeam.bmnum == bmnum:
+					ring.put(myBeam)
+			#a full ring holding less than a day means the beam comes faster than cadence
+			if ring.count() == ring.slots and ring.span() < RING_SECONDS:
+				logEvent(self.parent.logger, logging.WARNING, 'ring', 'RTI ring does not hold the last day, raise its cadence',
+					hours=round(ring.span() / 3600., 1), slots=ring.slots)
+			if ring.clipped > clipped:
+				logEvent(self.parent.logger, logging.WARNING, 'ring', 'Gates past the RTI ring dropped, raise nrangs',
+					gates=ring.gates, beams=ring.clipped - clipped)
+				clipped = ring.clipped
+			if ring.count()>2:
+				job = {'rad':self.parent.rad, 'name':self.parent.names[0],
+					'filepath':self.parent.filepath[0], 'bmnum':int(self.parent.beams[0]),
+					'rTime':timeNow, 'ring':ring.filenm,
+					'opts':plotOpts(self.parent.time)}
+				logErrors(self.parent, self.parent.renderPool.submit(renderTime, job).get())
 			else:
 				lowData(self,'time.png')
+			self.parent.timeSched.done(trig)
 	def join(self, timeout=None):
 		self.stoprequest.set()
-		logging.info("Closing timeThread")
+		self.parent.timeSched.stop()
+		self.parent.logger.info("Closing timeThread")
 		super(timeThread, self).join(timeout)
 					
+'''
+Logs the (message, error) pairs a render returned, repeats of the
+same message are held back by the log writer's filter
+'''
+def logErrors(radar, errors):
+	for msg, error in errors:
+		logEvent(radar.logger, logging.ERROR, 'render', msg, error=error)
+
+'''
+Logs one summary event per radar of the packets received, beams thrown
+away and renders since the previous call, instead of an event per packet
+'''
+def logStats(radars, writer):
+	for radar in radars:
+		packets = radar.packets - radar.loggedPackets
+		radar.loggedPackets = radar.packets
+		geoDropped, geoCoalesced = radar.scanState.losses()
+		timeDropped, timeCoalesced = radar.timeBeams.losses()
+		geoRenders, geoLatency, geoMax = radar.geoSched.summary()
+		timeRenders, timeLatency, timeMax = radar.timeSched.summary()
+		logEvent(radar.logger, logging.INFO, 'stats', 'Summary', packets=packets,
+			geoDropped=geoDropped, geoCoalesced=geoCoalesced,
+			timeDropped=timeDropped, timeCoalesced=timeCoalesced,
+			geoRenders=geoRenders, geoLatency=round(geoLatency, 3), geoMaxLatency=round(geoMax, 3),
+			timeRenders=timeRenders, timeLatency=round(timeLatency, 3), timeMaxLatency=round(timeMax, 3),
+			logDropped=writer.dropped)
+
 '''
 ProcessMsg(self)
 loads in the json data and load it correctly into
@@ -261,16 +199,20 @@ the specific beam with the fit and param data
 Then upload the data in the proper que so that
 the correct thread runs and updates
 '''
-def processMsg(self):
+def processMsg(self,msg):
     try:
-        dic = json.loads(self.data)
+        dic = json.loads(msg)
     except ValueError:
-        # errors out if we got multiple packets (race condition)
-        # If we get more than one dictionary, just skip the whole thing
-        # this shouldn't happen very often
-        logging.info("Error decoding dictionary, skipping packet")
+        self.parent.logger.info("Error decoding dictionary, skipping packet")
         return
-    
+    processDict(self,dic)
+
+'''
+processDict(self,dic)
+loads a decoded record into the specific beam,
+shared by the json and binary frame clients
+'''
+def processDict(self,dic):
     #prm data update
     self.parent.myBeam = beamData()
     self.parent.myBeam.updateValsFromDict(dic)
@@ -290,85 +232,17 @@ def processMsg(self):
     
     #inserts removes and inserts new beam data
     self.gque.put(self.parent.myBeam)
+    self.parent.geoSched.beam(self.parent.myBeam.bmnum, dic.get('scan', 0))
+    #every beam goes into the history store, only the time plot beam triggers a render
+    self.tque.put(self.parent.myBeam)
     if self.parent.myBeam.bmnum == int(self.parent.beams[0]):
-        self.tque.put(self.parent.myBeam)
-    logging.info("Proccessing packet: %s" % (str(self.parent.i)))
+        self.parent.timeSched.trigger(BEAM)
+    logEvent(self.parent.logger, logging.DEBUG, 'packet', 'Processing packet',
+        packet=self.parent.i, bmnum=self.parent.myBeam.bmnum)
     self.parent.i = self.parent.i+1
+    self.parent.packets += 1
     self.endP = True
 
-'''
-incommingData
-parses incomming text into the fit and param data section
-'''
-def incommingData(self,data):	
-    #As soon as any data is received, write it back.
-    time.sleep(0.5)
-    self.find = str.find
-    start_count = self.data.count('["{')
-    if start_count != 0:
-        start_count -= 1
-    i = 0
-    self.data = data
-
-    while i <= start_count:
-    	time.sleep(0.5)
-        indS = self.find(self.data,'{"')
-        indF = self.find(self.data,']}')
-        self.parseS = True
-        if indS == -1 or indF == -1:
-            if indS != -1:
-                self.parseP = True
-                indF = self.find(data,'}]')
-            else:
-                indS = self.find(data,'{"')
-                indF = self.find(data,'}]')
-            self.parseS = False
-        if indF < indS:
-            indF = -1
-        if indS != -1 and indF != -1:
-            if self.parseS:
-                if i == start_count:
-                    self.data2 = self.data[indF+2:]+data
-                else:
-                    self.data2 = self.data[indF+2:]
-                self.data = self.data[indS:indF+2]
-            elif self.parseP:
-                self.data = self.data[indS:] + data[:indF+2]
-                data = data[indF+2:]
-                self.parseP = False
-            else:
-                self.data = data[indS:indF+2]
-                data = data[indF+2:]
-            self.comp = True
-        elif indF != -1:
-            self.data = self.data + data[:indF+2]
-            data = data[indF+2:]
-            self.comp = True
-        elif indS != -1:
-            if self.parseP:
-                self.data = self.data + data
-                self.parseP = False
-            else:
-                self.data = data[indS:]
-        else:
-            self.data = self.data + data
-        if self.comp:
-            processMsg(self)
-            if self.parseS:
-                data = self.data[indF+2:]+data
-                self.parseS = False
-            indS = self.find(data,'{"')
-            if indS != -1:
-                self.data = data[indS:]
-            else:
-                self.data = data
-            self.comp = False
-
-        if self.data2 != None:
-            self.data = self.data2
-            self.data2 = None
-        i +=1
-
 '''    
 Built in Twisted method overwritten:
 Initializes values recieves data calls the correct method
@@ -380,113 +254,268 @@ class EchoClient(protocol.Protocol):
         self.parent = self.factory.parent
         self.gque = self.factory.gque
         self.tque = self.factory.tque
-        logging.info('Connected')
-        self.data = ''
-        self.data2 = None
+        self.factory.resetDelay()
+        self.parent.connected = True
+        self.parent.logger.info('Connected')
+        self.splitter = JsonSplitter()
         self.parent.i = 1
         self.errorCount = 0
-        self.comp = False
         self.endP = False
-        self.parseP = False
-        self.parseS = False
-        logging.info('Connection Open')
+        self.parent.logger.info('Connection Open')
         self.transport.registerProducer(self.transport, streaming=True)
 
-	#Recieves data and calls incommingData method
+	#Recieves data and processes every record it completes
     def dataReceived(self, data):
-    	time.sleep(0.5)
-        incommingData(self,data)
+        for msg in self.splitter.feed(data):
+            processMsg(self,msg)
+    def connectionLost(self, reason):
+        self.parent.logger.info("Connection Lost")
+        if self.splitter.dropped:
+            self.parent.logger.info("Dropped %d records longer than %d bytes" % \
+                (self.splitter.dropped, self.splitter.maxlength))
+
+'''
+Receives the length prefixed binary frames (dmapframe.py)
+used instead of json when basic_gui is started with format=frame.
+Each frame holds exactly one record.
+'''
+class FrameClient(Int32StringReceiver):
+    structFormat = '<I'
+    MAX_LENGTH = 16*1024*1024
+
+    def connectionMade(self):
+        self.parent = self.factory.parent
+        self.gque = self.factory.gque
+        self.tque = self.factory.tque
+        self.factory.resetDelay()
+        self.parent.connected = True
+        self.parent.i = 1
+        self.endP = False
+        self.parent.logger.info('Connection Open')
+
+    def stringReceived(self, frame):
+        dic = decodeFrame(frame)
+        #the plotting code expects lists like the json client gives
+        for key, val in dic.iteritems():
+            if isinstance(val, numpy.ndarray):
+                dic[key] = val.tolist()
+        processDict(self,dic)
+
     def connectionLost(self, reason):
-        logging.info("Connection Lost")
+        self.parent.logger.info("Connection Lost")
 
 '''
 Handles lost server connections
-Stops the reactor, threads and changings image to show loss of connection
+Reconnects with exponential backoff, the threads, scan state and
+render workers keep running so nothing is rebuilt, and changes
+the images to show loss of connection
 '''
-class EchoFactory(ClientFactory):
+class EchoFactory(ReconnectingClientFactory):
     protocol = EchoClient
+    initialDelay = 1
+    factor = 2
+    maxDelay = 60
     def __init__(self,parent):
         self.parent = parent
 
 
     def clientConnectionFailed(self, connector, reason):
-        logging.debug("Connection failed - goodbye!")
-        logging.debug('Closed Connection')
-        reactor.stop()
-        try:
-            self.parent.gt.join()
-            self.parent.tt.join()
-        except:
-            logging.debug("Threads haven't started")
-        for pr in self.parent.fan['param']:
-            silentRemove(self,"fan_%s.png" % (pr))
-            silentRemove(self,"geo_%s.png" % (pr))
+        self.parent.connected = False
+        markLost(self,'Connection failed')
+        ReconnectingClientFactory.clientConnectionFailed(self, connector, reason)
+        self.parent.logger.debug('Retrying in %.1f seconds' % (self.delay))
 
 
     def clientConnectionLost(self, connector, reason):
-        logging.debug("Connection lost - goodbye!")
-        logging.debug('Closed Connection')
-        reactor.stop()
-        try:
-        	self.parent.gt.join()
-        	self.parent.tt.join()
-        except:
-            logging.debug("Threads haven't started")
-        for pr in self.parent.fan['param']:
-            silentRemove(self,"fan_%s.png" % (pr))
-            silentRemove(self,"geo_%s.png" % (pr))
+        self.parent.connected = False
+        self.parent.reconnects += 1
+        markLost(self,'Connection lost')
+        ReconnectingClientFactory.clientConnectionLost(self, connector, reason)
+        self.parent.logger.debug('Retrying in %.1f seconds' % (self.delay))
+
+
+# seconds between writes of the metrics and health files
+METRICS_INTERVAL = 10
+# seconds between summary events in the errlog files
+STATS_INTERVAL = 60
+# seconds a plotting thread gets to finish its render on shutdown
+JOIN_TIMEOUT = 30
 
+'''
+Draws the lost connection images once per outage, in a render worker
+without waiting for it as the reactor calls it too. reason is the same
+every time, so repeats are held back, the details go in fields
+'''
+def markLost(self,reason,**fields):
+	logEvent(self.parent.logger, logging.ERROR, 'feed', reason, **fields)
+	if not self.parent.lost:
+		self.parent.lost = True
+		files = []
+		for pr in self.parent.fan['param']:
+			files.append("fan_%s.png" % (pr))
+			files.append("geo_%s.png" % (pr))
+		silentRemove(self,files)
 
 '''
-Initializes queues and threads and sets up to wait for a server to connect
+Writes the state of every radar to the health file, replacing it in one
+step. The reactor writes it, so a file that stops changing means a hung
+process. A radar is dead when one of its plotting threads has died and
+stuck when no render of it has finished for twice the staleness, the
+time plot finishes one at least every staleness seconds even without
+data. Both need a restart, stale and disconnected mean a feed without data
 '''
-def serverCon(self):
+def writeHealth(radars,filenm):
+	now = time.time()
+	timeNow = datetime.datetime.utcnow()
+	health = {'time':now, 'pid':os.getpid(), 'radars':{}}
+	for radar in radars:
+		lastBeam = timeNow - radar.scanState.latest().time.replace(tzinfo=None)
+		lastRender = now - max(radar.geoSched.lastDone, radar.timeSched.lastDone)
+		geoAlive = radar.gt.is_alive()
+		timeAlive = radar.tt.is_alive()
+		if not (geoAlive and timeAlive):
+			status = 'dead'
+		elif lastRender > 2 * float(radar.staleness[0]):
+			status = 'stuck'
+		elif not radar.connected:
+			status = 'disconnected'
+		elif radar.lost:
+			status = 'stale'
+		else:
+			status = 'ok'
+		health['radars'][radar.rad+radar.channels[0]] = {'status':status,
+			'connected':radar.connected, 'reconnects':radar.reconnects,
+			'geoThread':geoAlive, 'timeThread':timeAlive,
+			'lastBeam':lastBeam.total_seconds(),
+			'lastRender':lastRender,
+			'renders':radar.geoSched.renders + radar.timeSched.renders}
+	tmp = filenm + '.tmp'
+	with open(tmp,'w') as f:
+		json.dump(health,f)
+	os.rename(tmp,filenm)
+
+'''
+Sets up the root logger, writing JSON lines to the errlog file and the
+console, and a logger per radar. With more than one radar each one writes
+to its own errlog file. Everything is written by one LogWriter thread,
+at DEBUG with verbose=1 and INFO otherwise
+'''
+def setupLogging(radars):
 	t_date = datetime.date.today()
+	writer = LogWriter()
 	logger = logging.getLogger()
-	old_log = logger.handlers[0]
-	logger.removeHandler(old_log)
-	#root_logger.disabled = True
-	#new_logger = logging.getLogger()
-	#new_logger.disabled = False
-	rl = logging.basicConfig(filename="errlog/err_%s%s_%s"\
-		% (self.rad,self.channels[0],t_date.strftime('%Y%m%d')), level=logging.DEBUG, \
-		format='%(asctime)s %(message)s')
-	lh = logging.StreamHandler(rl)
-	logger.addHandler(lh)
+	for old_log in list(logger.handlers):
+		logger.removeHandler(old_log)
+	logger.setLevel(logging.DEBUG if radars[0].verbose[0] == '1' else logging.INFO)
+	logger.addHandler(writer.handler(logging.FileHandler("errlog/err_%s_%s"\
+		% ('_'.join(r.rad+r.channels[0] for r in radars),t_date.strftime('%Y%m%d')))))
+	logger.addHandler(writer.handler(logging.StreamHandler()))
+	for radar in radars:
+		radar.logger = logging.getLogger('radar.%s%s' % (radar.rad,radar.channels[0]))
+		if len(radars) > 1:
+			radar.logger.addHandler(writer.handler(logging.FileHandler("errlog/err_%s%s_%s"\
+				% (radar.rad,radar.channels[0],t_date.strftime('%Y%m%d')))))
+			radar.logger.propagate = False
+	writer.start()
+	return logger, writer
+
+'''
+Initializes queues and threads of every radar, connects them all
+to their servers and runs the reactor they share
+'''
+def serverCon(radars):
+	#one pool of render processes draws the plots of every radar, forked
+	#before the log writer starts as the workers return their errors
+	pool = RenderPool(int(radars[0].workers[0]), [radar.rad for radar in radars])
+	logger, writer = setupLogging(radars)
 	logger.debug('Starting everything')
 	print 'Writting to file'
+	registry = Registry()
+	for radar in radars:
+		radar.packets = 0
+		radar.loggedPackets = 0
+		radar.connected = False
+		radar.lost = False
+		radar.reconnects = 0
+		radar.renderPool = pool
+		radar.registry = registry
+		radarCon(radar)
+	if radars[0].metrics[0]:
+		LoopingCall(registry.writeFile, radars[0].metrics[0]).start(METRICS_INTERVAL, now=False)
+	if radars[0].health[0]:
+		LoopingCall(writeHealth, radars, radars[0].health[0]).start(METRICS_INTERVAL)
+	if radars[0].warm[0]:
+		LoopingCall(saveWarm, radars).start(WARM_INTERVAL, now=False)
+	LoopingCall(logStats, radars, writer).start(STATS_INTERVAL, now=False)
+	#twisted's own handlers are not installed, these only stop the reactor
+	stop = lambda signum, frame: reactor.callFromThread(reactor.stop)
+	signal.signal(signal.SIGTERM, stop)
+	signal.signal(signal.SIGINT, stop)
+	try:
+		reactor.run(installSignalHandlers=0)
+	finally:
+		shutdown(radars, pool, writer)
+
+'''
+Stops the plotting threads once their render is done, saves the warm
+start snapshot and the RTI rings, then stops the render workers and
+writes out the queued log records
+'''
+def shutdown(radars, pool, writer):
+	for radar in radars:
+		radar.gt.join(JOIN_TIMEOUT)
+		radar.tt.join(JOIN_TIMEOUT)
+		radar.ring.flush()
+	if radars[0].warm[0]:
+		saveWarm(radars)
+	pool.close()
+	writer.stop()
+
+'''
+Initializes the queues and threads of one radar
+and sets up to wait for its server to connect
+'''
+def radarCon(self):
 	f = EchoFactory(self)
+	if self.format[0] == 'frame':
+		f.protocol = FrameClient
 	f.parent = self
-	f.gque = Queue()
-	f.gque.put(self.myScan)
-	f.tque = Queue()
-	f.tque.put(self.myBeamList)
+	name = self.rad+self.channels[0]
+	f.gque = ScanState(self.myScan,
+		dropped = self.registry.counter('gui_dropped_beams_total', 'Beams thrown away because drawing fell behind', radar=name, queue='geo'),
+		coalesced = self.registry.counter('gui_coalesced_beams_total', 'Beams replaced by a newer beam of the same number before being drawn', radar=name, queue='geo'))
+	f.tque = WindowBeams(
+		dropped = self.registry.counter('gui_dropped_beams_total', 'Beams thrown away because drawing fell behind', radar=name, queue='time'),
+		coalesced = self.registry.counter('gui_coalesced_beams_total', 'Beams replaced by a newer beam of the same number before being drawn', radar=name, queue='time'))
+	self.geoSched = RenderScheduler('geo', float(self.coalesce[0]), float(self.staleness[0]), self.logger)
+	self.timeSched = RenderScheduler('time', float(self.coalesce[1]), float(self.staleness[0]), self.logger)
+	self.scanState = f.gque
+	self.timeBeams = f.tque
 	f.tt = timeThread(self,f.tque)
-	f.gt = geoThread(self,f.gque,f.tque)
+	f.gt = geoThread(self,f.gque)
 	f.gt.start()
 	f.tt.start()
-	f.logger = logger
+	self.gt = f.gt
+	self.tt = f.tt
+	f.logger = self.logger
 	reactor.connectTCP(self.hosts[0], int(self.ports[0]), f)
-	reactor.run(installSignalHandlers=0)
 
 
 '''
-Clears figure and replaces with text indicating lost connection for
-geographic and beam and gates plots
+Replaces the geographic and beam and gates images in filenames with
+text indicating lost connection, the errors are logged once drawn
 '''
-def silentRemove(self,filename):
-	for fanFig in self.parent.fan['figure']:
-		fanFig.clf()
-		fanFig.text(0.5,0.5,'Lost Connection',backgroundcolor='r',
-			size='x-large',style='oblique',ha='center',va='center')
-		fanFig.savefig("%s%s" % (self.parent.filepath[0],filename))
+def silentRemove(self,filenames):
+	radar = self.parent
+	job = {'rad':radar.rad, 'text':'Lost Connection',
+		'files':["%s%s" % (radar.filepath[0],filename) for filename in filenames]}
+	radar.renderPool.submit(renderText, job, lambda errors: logErrors(radar, errors))
 
 '''
-Clears figure and replaces with text indicating low data amounts only for 
+Replaces the image with text indicating low data amounts only for 
 time plots
 '''
 def lowData(self,filename):
-	self.parent.time['figure'].clf()
-	self.parent.time['figure'].text(0.5,0.5,'No Data',backgroundcolor='r',
-		size='x-large',style='oblique',ha='center',va='center')
-	self.parent.time['figure'].savefig("%s%s" % (self.parent.filepath[0],filename))
+	job = {'rad':self.parent.rad, 'text':'No Data',
+		'files':["%s%s" % (self.parent.filepath[0],filename)]}
+	logErrors(self.parent, self.parent.renderPool.submit(renderText, job).get())
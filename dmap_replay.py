@@ -0,0 +1,65 @@
+# serves dmap capture files (capture.py) on a local port, standing in
+# for the superdarn.gi.alaska.edu dmap feeds
+#
+# python2.7 dmap_replay.py port=6031 speed=1 capture/ade_*.dmap
+#   port  - port to serve on
+#   speed - 1 replays at the recorded pace, N at N times that,
+#           0 as fast as possible
+#   loop  - 1 starts over from the first file when the last one ends
+
+import socket
+import time
+import sys
+from capture import readCapture
+
+def replay(conn, files, speed):
+	nbytes = 0
+	start = time.time()
+	first = None
+	for filenm in files:
+		print('replaying %s' % (filenm))
+		for rtime, chunk in readCapture(filenm):
+			if first is None:
+				first = rtime
+			if speed > 0:
+				delay = start + (rtime - first) / speed - time.time()
+				if delay > 0:
+					time.sleep(delay)
+			conn.sendall(chunk)
+			nbytes += len(chunk)
+	print('sent %d bytes in %.1fs' % (nbytes, time.time() - start))
+
+def main():
+	port = 6031
+	speed = 1.
+	loop = False
+	files = []
+	for argL in sys.argv[1:]:
+		if argL.startswith('port='):
+			port = int(argL[len('port='):])
+		elif argL.startswith('speed='):
+			speed = float(argL[len('speed='):])
+		elif argL.startswith('loop='):
+			loop = argL[len('loop='):] == '1'
+		else:
+			files.append(argL)
+	files.sort()
+
+	s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	s.bind(('', port))
+	s.listen(1)
+	while True:
+		print('waiting for connection..')
+		conn, addr = s.accept()
+		print('connected!')
+		try:
+			replay(conn, files, speed)
+			while loop:
+				replay(conn, files, speed)
+		except socket.error:
+			print('connection lost')
+		conn.close()
+
+if __name__ == '__main__':
+	main()
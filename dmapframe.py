@@ -0,0 +1,85 @@
+# length prefixed binary frames for dmap records
+# an opt-in alternative to JSON between pydmap_daemon.py and connection.py
+#
+# all values are little-endian
+#   uint32  number of bytes that follow
+#   uint16  number of fields
+#   field table, per field:
+#     uint8 name length, name, uint8 dmap type code, uint8 ndims,
+#     uint32 dims[ndims], uint32 offset of the values in the data section
+#   data section, every field's values as a raw array, 8 byte aligned
+# scalars have ndims 0, strings are stored as DATASTRING with their
+# length as the only dimension
+
+import numpy as np
+import struct
+from pydmap import DTYPE_CODES, DATASTRING
+
+# dmap type code for each numpy type
+FRAME_CODES = dict((dtype, code) for code, dtype in DTYPE_CODES.items() if dtype != str)
+
+LENGTH = struct.Struct('<I')
+ALIGN = 8
+
+def encodeFrame(scalars, vectors):
+	table = []
+	data = []
+	off = 0
+	fields = [(name, payload, True) for name, payload in scalars.iteritems()] + \
+		[(name, payload, False) for name, payload in vectors.iteritems()]
+	for name, payload, scalar in fields:
+		if isinstance(payload, str):
+			code = DATASTRING
+			dims = (len(payload),)
+			raw = payload
+		else:
+			payload = np.asarray(payload)
+			code = FRAME_CODES[payload.dtype.newbyteorder('<')]
+			dims = () if scalar else payload.shape[::-1]
+			raw = payload.astype(payload.dtype.newbyteorder('<'), copy=False).tostring()
+		table.append(struct.pack('<B%dsBB%dII' % (len(name), len(dims)), len(name), name,
+			code, len(dims), *(tuple(dims) + (off,))))
+		pad = -len(raw) % ALIGN
+		data.append(raw + '\0' * pad)
+		off += len(raw) + pad
+
+	header = struct.pack('<H', len(fields)) + ''.join(table)
+	header += '\0' * (-(len(header) + LENGTH.size) % ALIGN)
+	body = header + ''.join(data)
+	return LENGTH.pack(len(body)) + body
+
+'''
+Decodes the body of a frame, without its length prefix, into a
+dictionary. Scalars come back as python values and vectors as numpy
+views of buf.
+'''
+def decodeFrame(buf):
+	nfields, = struct.unpack_from('<H', buf, 0)
+	pos = 2
+	table = []
+	for i in range(nfields):
+		namelen, = struct.unpack_from('<B', buf, pos)
+		name, code, ndims = struct.unpack_from('<%dsBB' % (namelen), buf, pos + 1)
+		pos += namelen + 3
+		fmt = '<%dII' % (ndims)
+		values = struct.unpack_from(fmt, buf, pos)
+		pos += struct.calcsize(fmt)
+		table.append((name, code, values[:-1], values[-1]))
+
+	# data section starts at the next aligned offset, counting the length prefix
+	start = pos + (-(pos + LENGTH.size) % ALIGN)
+	dic = {}
+	for name, code, dims, off in table:
+		off += start
+		if code == DATASTRING:
+			dic[name] = buf[off:off + dims[0]]
+			continue
+		dtype = DTYPE_CODES[code]
+		if len(dims) == 0:
+			dic[name] = np.frombuffer(buf, dtype=dtype, count=1, offset=off)[0].item()
+		else:
+			payload = np.frombuffer(buf, dtype=dtype, count=int(np.prod(dims)), offset=off)
+			if len(dims) > 1:
+				payload = np.reshape(payload, dims[::-1])
+			dic[name] = payload
+	return dic
@@ -0,0 +1,126 @@
+# structured, low overhead logging for basic_gui
+# log records are written as JSON lines by one background thread, so
+# the twisted reactor and the plotting threads only hand each record to
+# a bounded queue and never wait on the disk. Fields given with
+# logEvent() land in the JSON line next to the message, per packet
+# events are only logged at DEBUG and the same warning or error, such
+# as a plot missing info on every redraw, is written at most once a
+# minute with the number of repeats held back.
+
+import json
+import time
+import datetime
+import logging
+from Queue import Queue, Full
+from threading import Thread
+
+# records waiting to be written before new ones are dropped
+QUEUE_SIZE = 10000
+# seconds the same warning or error is held back for
+REPEAT_INTERVAL = 60
+
+'''
+Logs msg with the given fields at level, the fields are only built
+into a record when the logger is enabled for that level
+'''
+def logEvent(logger, level, stage, msg, **fields):
+	if logger.isEnabledFor(level):
+		fields['stage'] = stage
+		logger.log(level, msg, extra={'event':fields})
+
+'''
+Formats a record as one JSON object per line
+'''
+class JsonFormatter(logging.Formatter):
+	def format(self, record):
+		line = {'time':datetime.datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+			'level':record.levelname, 'logger':record.name, 'msg':record.getMessage()}
+		line.update(getattr(record, 'event', {}))
+		if getattr(record, 'repeats', 0):
+			line['repeats'] = record.repeats
+		if record.exc_info:
+			line['exc'] = self.formatException(record.exc_info)
+		return json.dumps(line, default=str)
+
+'''
+Passes a warning or error at most once every interval seconds per logger
+and message, the first record let through afterwards carries the number
+held back in between as repeats
+'''
+class RepeatFilter(logging.Filter):
+	def __init__(self, interval = REPEAT_INTERVAL, level = logging.WARNING):
+		logging.Filter.__init__(self)
+		self.interval = interval
+		self.level = level
+		self.seen = {}
+
+	def filter(self, record):
+		if record.levelno < self.level:
+			return True
+		now = time.time()
+		key = (record.name, record.levelno, record.msg)
+		last, repeats = self.seen.get(key, (0, 0))
+		if now - last < self.interval:
+			self.seen[key] = (last, repeats + 1)
+			return False
+		if len(self.seen) > 1000:
+			self.seen = dict((k, v) for k, v in self.seen.iteritems() if now - v[0] < self.interval)
+		self.seen[key] = (now, 0)
+		record.repeats = repeats
+		return True
+
+'''
+Handler that queues records for a LogWriter to write to target
+'''
+class QueueHandler(logging.Handler):
+	def __init__(self, writer, target):
+		logging.Handler.__init__(self)
+		self.writer = writer
+		self.target = target
+
+	def emit(self, record):
+		#the message is built now, its arguments may change before it is written
+		record.msg = record.getMessage()
+		record.args = None
+		try:
+			self.writer.queue.put_nowait((self.target, record))
+		except Full:
+			self.writer.dropped += 1
+
+'''
+Background thread writing queued records to their handlers
+'''
+class LogWriter(Thread):
+	def __init__(self, maxsize = QUEUE_SIZE):
+		super(LogWriter, self).__init__()
+		self.daemon = True
+		self.queue = Queue(maxsize)
+		self.dropped = 0
+
+	'''
+	A QueueHandler for target, which gets the JSON formatter
+	and the repeat filter
+	'''
+	def handler(self, target):
+		target.setFormatter(JsonFormatter())
+		qh = QueueHandler(self, target)
+		qh.addFilter(RepeatFilter())
+		return qh
+
+	def run(self):
+		while True:
+			item = self.queue.get()
+			if item is None:
+				break
+			target, record = item
+			try:
+				target.handle(record)
+			except Exception:
+				target.handleError(record)
+
+	'''
+	Writes what is queued and stops
+	'''
+	def stop(self):
+		self.queue.put(None)
+		self.join()
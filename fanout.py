@@ -0,0 +1,170 @@
+# broadcast of a radar's encoded records to any number of subscribers
+# used by pydmap_daemon.py, every subscriber has its own bounded queue
+# and is written to without blocking, so a slow subscriber only loses
+# its own oldest records instead of stalling the dmap feed
+
+import socket
+import errno
+import time
+import traceback
+from collections import deque
+
+# records queued per subscriber before the oldest are dropped
+QUEUE_SIZE = 100
+
+'''
+One connected subscriber, with its queue and counters
+'''
+class Subscriber(object):
+	def __init__(self, conn, addr, maxqueue = QUEUE_SIZE):
+		self.conn = conn
+		self.addr = '%s:%d' % (addr[0], addr[1])
+		self.queue = deque()
+		self.maxqueue = maxqueue
+		self.current = None
+		self.offset = 0
+		self.closed = False
+		self.connected = time.time()
+		self.sent = 0
+		self.sentBytes = 0
+		self.dropped = 0
+		self.lag = 0.
+
+	def pending(self):
+		return self.current is not None or len(self.queue) > 0
+
+	'''
+	Queues a record, dropping the oldest queued record when full.
+	A record already partly written is never dropped.
+	'''
+	def push(self, msg, now):
+		if len(self.queue) >= self.maxqueue:
+			self.queue.popleft()
+			self.dropped += 1
+		self.queue.append((now, msg))
+
+	'''
+	Queues a record and writes what the socket takes
+	'''
+	def send(self, msg, now):
+		self.push(msg, now)
+		self.flush(now)
+
+	'''
+	Writes as much of the queue as the socket takes without blocking
+	'''
+	def flush(self, now):
+		while not self.closed:
+			if self.current is None:
+				if not self.queue:
+					self.lag = 0.
+					return
+				self.current = self.queue.popleft()
+				self.offset = 0
+			queued, msg = self.current
+			self.lag = now - queued
+			try:
+				nsent = self.conn.send(buffer(msg, self.offset))
+			except socket.error as e:
+				if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+					return
+				self.close(str(e))
+				return
+			self.offset += nsent
+			self.sentBytes += nsent
+			if self.offset == len(msg):
+				self.current = None
+				self.sent += 1
+
+	'''
+	Subscribers don't send anything, reading only notices when they go away
+	'''
+	def readable(self, now):
+		try:
+			data = self.conn.recv(4096)
+		except socket.error as e:
+			if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+				return
+			data = ''
+		if not data:
+			self.close('disconnected')
+
+	def close(self, reason):
+		if not self.closed:
+			self.closed = True
+			self.reason = reason
+			self.conn.close()
+
+	def stats(self):
+		return {'addr':self.addr, 'sent':self.sent, 'bytes':self.sentBytes,
+			'dropped':self.dropped, 'queued':len(self.queue), 'lag':self.lag}
+
+'''
+A listening port that broadcasts every published record
+to all of its subscribers
+'''
+class Broadcaster(object):
+	def __init__(self, name, port, maxqueue = QUEUE_SIZE):
+		self.name = name
+		self.port = int(port)
+		self.maxqueue = maxqueue
+		self.subscribers = []
+		# exceptions that closed a subscriber or hit the listener
+		self.failures = 0
+
+		self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.listener.bind(('', self.port))
+		self.listener.listen(10)
+		self.listener.setblocking(0)
+
+	def accept(self, now):
+		try:
+			conn, addr = self.listener.accept()
+		except socket.error:
+			return
+		conn.setblocking(0)
+		sub = Subscriber(conn, addr, self.maxqueue)
+		self.subscribers.append(sub)
+		print('%s: %s subscribed on %d' % (self.name, sub.addr, self.port))
+
+	def active(self):
+		return len(self.subscribers) > 0
+
+	def publish(self, msg, now):
+		for sub in self.subscribers:
+			self.guard(sub, lambda now, sub=sub: sub.send(msg, now), now)
+
+	'''
+	Calls handler for sub, or for the listener when sub is None. An
+	exception in it is printed and counted and only closes sub, the
+	other subscribers and the upstream feed carry on
+	'''
+	def guard(self, sub, handler, now):
+		try:
+			handler(now)
+		except Exception as e:
+			traceback.print_exc()
+			self.failures += 1
+			if sub is not None:
+				sub.close('failed with %s: %s' % (type(e).__name__, e))
+
+	'''
+	Adds the listener and subscriber sockets to the select handler
+	tables, each called through guard, forgetting subscribers that
+	have gone away
+	'''
+	def register(self, rhandlers, whandlers):
+		rhandlers[self.listener] = lambda now: self.guard(None, self.accept, now)
+		for sub in self.subscribers:
+			if sub.closed:
+				print('%s: %s unsubscribed from %d, %s, sent %d dropped %d' % \
+					(self.name, sub.addr, self.port, sub.reason, sub.sent, sub.dropped))
+		self.subscribers = [sub for sub in self.subscribers if not sub.closed]
+		for sub in self.subscribers:
+			rhandlers[sub.conn] = lambda now, sub=sub: self.guard(sub, sub.readable, now)
+			if sub.pending():
+				whandlers[sub.conn] = lambda now, sub=sub: self.guard(sub, sub.flush, now)
+
+	def stats(self):
+		return [sub.stats() for sub in self.subscribers]
@@ -141,7 +141,6 @@ def plotFan(myScan,rad,params='velocity',filtered=False ,\
     #check freq band and set to default if needed
     assert(tFreqBands == [] or len(tFreqBands) == len(rad)),'error, if present, tFreqBands must have same number of elements as rad'
     for i in range(len(myFigs)):
-		time.sleep(01)
 		param = params[i]
 		scale = scales[i]
 		myFig = myFigs[i]
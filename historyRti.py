@@ -0,0 +1,70 @@
+# draws the time plot of any beam of a radar from the binary history
+# (historyStore.py). basic_gui.py only keeps the RTI ring of its time plot
+# beam, the history holds every beam received, so this draws the others
+# or a window further back than the ring goes.
+#
+# python2.7 historyRti.py rad=ade beam=3 hours=24 out=ade_beam3.png
+#   rad     - radar code
+#   channel - channel letter of the radar, if it has channels
+#   beam    - beam number to draw
+#   hours   - length of the window, default 24
+#   end     - UTC end of the window as yyyymmddHHMM, default now
+#   params  - comma separated plot parameters, default velocity,power,width
+#   name    - title of the plot, default the radar code
+#   folder  - folder of the binary history, default data
+#   out     - image to save, default <rad><channel>_beam<n>.png
+
+import sys
+import datetime
+import matplotlib.pyplot as plot
+from historyStore import HISTORY_DIR
+from rtiRing import historyWindow
+from rtiJS import plotRti
+
+def main():
+	rad = None
+	channel = ''
+	bmnum = None
+	hours = 24.
+	timeNow = datetime.datetime.utcnow()
+	params = ['velocity', 'power', 'width']
+	title = None
+	folder = HISTORY_DIR
+	out = None
+	for argL in sys.argv[1:]:
+		if argL.startswith('rad='):
+			rad = argL[len('rad='):]
+		elif argL.startswith('channel='):
+			channel = argL[len('channel='):]
+		elif argL.startswith('beam='):
+			bmnum = int(argL[len('beam='):])
+		elif argL.startswith('hours='):
+			hours = float(argL[len('hours='):])
+		elif argL.startswith('end='):
+			timeNow = datetime.datetime.strptime(argL[len('end='):], '%Y%m%d%H%M')
+		elif argL.startswith('params='):
+			params = argL[len('params='):].split(',')
+		elif argL.startswith('name='):
+			title = argL[len('name='):]
+		elif argL.startswith('folder='):
+			folder = argL[len('folder='):]
+		elif argL.startswith('out='):
+			out = argL[len('out='):]
+	if rad is None or bmnum is None:
+		print('rad= and beam= are needed')
+		sys.exit(1)
+	if out is None:
+		out = '%s%s_beam%d.png' % (rad, channel, bmnum)
+	timeThen = timeNow - datetime.timedelta(hours=hours)
+	window = historyWindow(rad + channel, bmnum, timeThen, timeNow, folder = folder)
+	if len(window['time']) == 0:
+		print('no history of beam %d of %s%s from %s to %s' % (bmnum, rad, channel, timeThen, timeNow))
+		sys.exit(1)
+	fig = plot.figure()
+	plotRti(window, rad, bmnum = bmnum, params = params, figure = fig,
+		rTime = timeNow, title = title or rad)
+	fig.savefig(out)
+	print('%s: %d beams from %s to %s' % (out, len(window['time']), timeThen, timeNow))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,247 @@
+# binary history of every beam received
+# every radar gets two append only files per beam number and UTC day in data/
+#   <yyyymmdd>_<rad><chan>_beam<n>.prm   - one fixed width PRM_DTYPE record
+#                                          per beam
+#   <yyyymmdd>_<rad><chan>_beam<n>.gates - the GATE_DTYPE values of every
+#                                          beam one after another, found
+#                                          through the offset and npnts of
+#                                          the beam's prm record
+# both are plain arrays, numpy.fromfile or numpy.memmap read them as is,
+# and a day takes a fraction of the space of the old repr text lines.
+# Keeping each beam number in its own files makes the history of any one
+# beam a contiguous read, rtiRing.historyWindow() gives it in the columns
+# plotRti draws from. A sparse time index sits next to each prm file
+#   <yyyymmdd>_<rad><chan>_beam<n>.tidx  - the time of every INDEX_STRIDE'th
+#                                          prm record
+# records are appended as they arrive, in time order, so reading a window
+# binary searches the index and maps only the records in between, at a
+# cost that follows the length of the window rather than of the day.
+# The gates of a batch are written before its prm records, so a prm
+# record never points past the end of the gates file.
+
+import os
+import calendar
+import datetime
+import numpy as np
+from davitpy.pydarn.sdio.radDataTypes import beamData
+
+HISTORY_DIR = 'data'
+
+PRM_KEYS = ('nrang', 'rsep', 'frang', 'tfreq', 'noisesearch', 'noisesky', \
+	'nave', 'inttsc', 'ifmode')
+PRM_DTYPE = np.dtype([('time', '<f8'), ('bmnum', '<i2'), ('cp', '<i2'), ('stid', '<i2'), \
+	('nrang', '<i2'), ('rsep', '<i2'), ('frang', '<i2'), ('tfreq', '<f4'), \
+	('noisesearch', '<f4'), ('noisesky', '<f4'), ('nave', '<i2'), ('inttsc', '<f4'), \
+	('ifmode', '<i2'), ('offset', '<u4'), ('npnts', '<u2')])
+GATE_KEYS = ('slist', 'v', 'p_l', 'w_l', 'gflg', 'elv', 'phi0')
+GATE_DTYPE = np.dtype([('slist', '<i2'), ('v', '<f4'), ('p_l', '<f4'), ('w_l', '<f4'), ('gflg', '<i1'), \
+	('elv', '<f4'), ('phi0', '<f4')])
+# gate values not every radar sends, NaN when a beam has none
+OPTIONAL_GATE_KEYS = ('elv', 'phi0')
+# prm records per time index entry
+INDEX_STRIDE = 64
+INDEX_DTYPE = np.dtype('<f8')
+
+'''
+Seconds since 1970 of a naive UTC or timezone aware datetime
+'''
+def epoch(dt):
+	return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+'''
+count gate values, zero but for NaN in the optional keys
+'''
+def newGates(count):
+	gates = np.zeros(count, dtype=GATE_DTYPE)
+	for key in OPTIONAL_GATE_KEYS:
+		gates[key] = np.nan
+	return gates
+
+'''
+prm records and gate values of beams, the gates of the first beam
+start at offset in the gates array they are appended to
+'''
+def toArrays(beams, offset = 0):
+	npnts = [len(myBeam.fit.slist) if myBeam.fit.slist is not None else 0 for myBeam in beams]
+	prm = np.zeros(len(beams), dtype=PRM_DTYPE)
+	gates = newGates(sum(npnts))
+	off = 0
+	for i, (myBeam, n) in enumerate(zip(beams, npnts)):
+		row = prm[i]
+		row['time'] = epoch(myBeam.time)
+		row['bmnum'] = myBeam.bmnum
+		row['cp'] = myBeam.cp or 0
+		row['stid'] = myBeam.stid or 0
+		for key in PRM_KEYS:
+			row[key] = getattr(myBeam.prm, key) or 0
+		row['offset'] = offset + off
+		row['npnts'] = n
+		if n:
+			for key in GATE_KEYS:
+				values = getattr(myBeam.fit, key, None)
+				if values is not None or key not in OPTIONAL_GATE_KEYS:
+					gates[key][off:off + n] = values
+		off += n
+	return prm, gates
+
+'''
+Beams of prm records, their gate values are taken from gates. Each
+column is turned into a list in one go, which is much cheaper than
+reading the records one at a time
+'''
+def fromArrays(prm, gates):
+	if len(prm) == 0:
+		return []
+	cols = dict((key, prm[key].tolist()) for key in PRM_DTYPE.names)
+	start = int(prm['offset'].min())
+	end = int((prm['offset'].astype(np.int64) + prm['npnts']).max())
+	gateCols = dict((key, gates[key][start:end].tolist()) for key in GATE_KEYS)
+	beams = []
+	for i in range(len(prm)):
+		myBeam = beamData()
+		myBeam.time = datetime.datetime.utcfromtimestamp(cols['time'][i])
+		myBeam.bmnum = cols['bmnum'][i]
+		myBeam.cp = cols['cp'][i]
+		myBeam.stid = cols['stid'][i]
+		for key in PRM_KEYS:
+			setattr(myBeam.prm, key, cols[key][i])
+		off = cols['offset'][i] - start
+		n = cols['npnts'][i]
+		for key in GATE_KEYS:
+			setattr(myBeam.fit, key, gateCols[key][off:off + n])
+		beams.append(myBeam)
+	return beams
+
+def dayPrefix(name, day, bmnum, folder = HISTORY_DIR):
+	return os.path.join(folder, '%s_%s_beam%d' % (day.strftime('%Y%m%d'), name, bmnum))
+
+'''
+Maps a file of records read only, whole records only in case a write
+was cut short, an empty array when there is none
+'''
+def mapFile(filenm, dtype):
+	try:
+		count = os.path.getsize(filenm) // dtype.itemsize
+	except OSError:
+		count = 0
+	if count == 0:
+		return np.zeros(0, dtype=dtype)
+	return np.memmap(filenm, dtype=dtype, mode='r', shape=(count,))
+
+'''
+Appends beams to the day files of radar name, by the day and beam
+number of each beam, with one pair of writes per day and beam number
+'''
+def appendBeams(name, beams, folder = HISTORY_DIR):
+	days = {}
+	for myBeam in beams:
+		days.setdefault((myBeam.time.date(), myBeam.bmnum), []).append(myBeam)
+	for (day, bmnum), dayBeams in sorted(days.iteritems()):
+		prm, gates = toArrays(dayBeams)
+		appendArrays(dayPrefix(name, day, bmnum, folder), prm, gates)
+
+'''
+Appends prm records and the gate values they point into, with offsets
+from 0, to the files of prefix and adds them to its time index
+'''
+def appendArrays(prefix, prm, gates):
+	try:
+		offset = os.path.getsize(prefix + '.gates') // GATE_DTYPE.itemsize
+	except OSError:
+		offset = 0
+	try:
+		count = os.path.getsize(prefix + '.prm') // PRM_DTYPE.itemsize
+	except OSError:
+		count = 0
+	prm = prm.copy()
+	prm['offset'] += offset
+	with open(prefix + '.gates', 'ab') as f:
+		gates.tofile(f)
+	with open(prefix + '.prm', 'ab') as f:
+		prm.tofile(f)
+	appendIndex(prefix, count, prm['time'])
+
+'''
+prm records rows of prm and the gate values they point into, with the
+offsets changed to point into the returned gates
+'''
+def selectRecords(prm, gates, rows):
+	prm = np.array(prm[rows])
+	npnts = prm['npnts'].astype(np.intp)
+	starts = prm['offset'].astype(np.intp)
+	#the gates of a record are contiguous
+	index = np.arange(npnts.sum()) + np.repeat(starts - np.cumsum(npnts) + npnts, npnts)
+	prm['offset'] = np.cumsum(npnts) - npnts
+	return prm, gates[index]
+
+'''
+Adds the times of the records that start a new INDEX_STRIDE block to the
+time index, given count records were already in the prm file. An index
+that does not match the records before them, from before the index or a
+write cut short, is rebuilt from the prm file first
+'''
+def appendIndex(prefix, count, times):
+	try:
+		entries = os.path.getsize(prefix + '.tidx') // INDEX_DTYPE.itemsize
+	except OSError:
+		entries = 0
+	if entries != -(-count // INDEX_STRIDE):
+		writeIndex(prefix)
+		return
+	first = -count % INDEX_STRIDE
+	with open(prefix + '.tidx', 'ab') as f:
+		times[first::INDEX_STRIDE].astype(INDEX_DTYPE).tofile(f)
+
+def writeIndex(prefix):
+	prm = mapFile(prefix + '.prm', PRM_DTYPE)
+	with open(prefix + '.tidx', 'wb') as f:
+		prm['time'][::INDEX_STRIDE].astype(INDEX_DTYPE).tofile(f)
+
+'''
+Range of records of a prm file that holds every record after start up
+to end, found from the time index, or the whole file without one
+'''
+def recordRange(prefix, prm, start, end):
+	index = mapFile(prefix + '.tidx', INDEX_DTYPE)
+	if len(index) == 0 or len(index) > -(-len(prm) // INDEX_STRIDE):
+		return 0, len(prm)
+	lo = max(np.searchsorted(index, start, 'right') - 1, 0)
+	hi = np.searchsorted(index, end, 'right')
+	if hi == len(index):
+		return lo * INDEX_STRIDE, len(prm)
+	return lo * INDEX_STRIDE, hi * INDEX_STRIDE
+
+'''
+prm records and gate values of one day and beam of radar name, memory mapped
+'''
+def readDay(name, day, bmnum, folder = HISTORY_DIR):
+	prefix = dayPrefix(name, day, bmnum, folder)
+	return mapFile(prefix + '.prm', PRM_DTYPE), mapFile(prefix + '.gates', GATE_DTYPE)
+
+def hasDay(name, day, bmnum, folder = HISTORY_DIR):
+	return os.path.exists(dayPrefix(name, day, bmnum, folder) + '.prm')
+
+'''
+prm records of beam bmnum of radar name after timeThen up to timeNow,
+and the gate values of each day they point into
+'''
+def readRecords(name, bmnum, timeThen, timeNow, folder = HISTORY_DIR):
+	start, end = epoch(timeThen), epoch(timeNow)
+	records = []
+	day = timeThen.date()
+	while day <= timeNow.date():
+		prm, gates = readDay(name, day, bmnum, folder)
+		lo, hi = recordRange(dayPrefix(name, day, bmnum, folder), prm, start, end)
+		prm = prm[lo:hi]
+		records.append((prm[(prm['time'] > start) & (prm['time'] <= end)], gates))
+		day += datetime.timedelta(days=1)
+	return records
+
+'''
+Beams of beam number bmnum of radar name after timeThen up to timeNow
+'''
+def readBeams(name, bmnum, timeThen, timeNow, folder = HISTORY_DIR):
+	beams = []
+	for prm, gates in readRecords(name, bmnum, timeThen, timeNow, folder):
+		beams.extend(fromArrays(prm, gates))
+	return beams
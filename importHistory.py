@@ -0,0 +1,219 @@
+# imports the old text history files into the binary history store
+# (historyStore.py). timeThread used to write one line per beam of the
+# time plot into data/<m><d><yyyy>_<rad><chan>, made of the repr of its
+# values. Each file is tokenised whole: its lines are split on ';' and
+# every array column of the file is joined and parsed by numpy in one
+# call, instead of splitArray's slicing and float() per value. Files are
+# parsed in a pool of processes and written in time order by this one,
+# so the day files and their time index stay sorted. Days that already
+# have binary history are left as they are.
+#
+# python2.7 importHistory.py beam=7 workers=8 data/*_ade data/*_adw
+#   beam    - beam number of the time plot the files were written for,
+#             the text lines do not hold it
+#   workers - processes parsing files, default one per core
+#   folder  - folder of the binary history, default data
+
+import re
+import sys
+import time
+import calendar
+import datetime
+import multiprocessing
+import numpy as np
+from historyStore import HISTORY_DIR, PRM_DTYPE, GATE_DTYPE, \
+	newGates, dayPrefix, hasDay, appendArrays, selectRecords
+
+DATETIME = re.compile(r'datetime\.datetime\(([^)]*)\)')
+
+# columns of a text line
+NCOLUMNS = 16
+PRM_COLUMNS = (('stid', 0), ('cp', 2), ('nave', 3), ('noisesky', 4), ('rsep', 5), \
+	('nrang', 6), ('frang', 7), ('noisesearch', 8), ('tfreq', 9), ('ifmode', 11))
+# the lines hold no elevation or phi0, they are left NaN
+ARRAY_COLUMNS = (('slist', 10), ('v', 12), ('p_l', 13), ('w_l', 14), ('gflg', 15))
+ARRAY_KEYS = tuple(key for key, col in ARRAY_COLUMNS)
+
+'''
+Seconds since 1970 of the repr of a datetime, NaN if there is none or
+it does not parse
+'''
+def parseTime(strDt):
+	match = DATETIME.search(strDt)
+	if match is None:
+		return np.nan
+	try:
+		parts = [int(part) for part in match.group(1).split(',')]
+		seconds = calendar.timegm(datetime.datetime(*parts).utctimetuple())
+	except (ValueError, TypeError):
+		return np.nan
+	if len(parts) > 6:
+		seconds += parts[6] / 1e6
+	return seconds
+
+def parseNumbers(column):
+	return np.array(['0' if val.strip() == 'None' else val for val in column], dtype=np.float64)
+
+'''
+Values of a column of array reprs joined into one array, and the
+number of values of each line
+'''
+def parseArrays(column):
+	stripped = [val.strip().strip('[]') for val in column]
+	stripped = ['' if val == 'None' else val for val in stripped]
+	counts = np.array([val.count(',') + 1 if val else 0 for val in stripped], dtype=np.intp)
+	joined = ','.join(val for val in stripped if val)
+	values = np.fromstring(joined, sep=',') if joined else np.zeros(0)
+	if len(values) != counts.sum():
+		raise ValueError('badly formed array')
+	return values, counts
+
+'''
+Parses a text history file into prm records and gate values, with the
+beam numbers left at 0. Lines that do not parse are skipped
+'''
+def parseFile(filenm):
+	with open(filenm) as f:
+		rows = [line.split(';') for line in f.read().splitlines()]
+	rows = [row for row in rows if len(row) == NCOLUMNS]
+	prm = np.zeros(len(rows), dtype=PRM_DTYPE)
+	if not rows:
+		return filenm, prm, np.zeros(0, dtype=GATE_DTYPE)
+	columns = zip(*rows)
+	prm['time'] = [parseTime(val) for val in columns[1]]
+	try:
+		for key, col in PRM_COLUMNS:
+			prm[key] = parseNumbers(columns[col])
+		arrays = dict((key, parseArrays(columns[col])) for key, col in ARRAY_COLUMNS)
+	except ValueError:
+		#a damaged line somewhere, the file is parsed a line at a time instead
+		return parseLines(filenm, rows)
+	counts = arrays['slist'][1]
+	good = np.ones(len(rows), dtype=bool)
+	for key in ARRAY_KEYS:
+		good &= arrays[key][1] == counts
+	good &= ~np.isnan(prm['time'])
+	prm['npnts'] = counts
+	prm['offset'] = np.cumsum(counts) - counts
+	gates = newGates(counts.sum())
+	if good.all():
+		for key in ARRAY_KEYS:
+			gates[key] = arrays[key][0]
+		return filenm, prm, gates
+	return parseLines(filenm, [row for row, ok in zip(rows, good) if ok])
+
+'''
+Parses the lines one at a time, skipping the ones that do not parse
+'''
+def parseLines(filenm, rows):
+	parsed = []
+	for row in rows:
+		try:
+			parsed.append(parseRow(row))
+		except ValueError:
+			pass
+	prm = np.zeros(len(parsed), dtype=PRM_DTYPE)
+	gates = []
+	off = 0
+	for i, (values, arrays) in enumerate(parsed):
+		for key in values:
+			prm[i][key] = values[key]
+		n = len(arrays['slist'])
+		prm[i]['offset'] = off
+		prm[i]['npnts'] = n
+		rowGates = newGates(n)
+		for key in ARRAY_KEYS:
+			rowGates[key] = arrays[key]
+		gates.append(rowGates)
+		off += n
+	return filenm, prm, np.concatenate(gates) if gates else np.zeros(0, dtype=GATE_DTYPE)
+
+'''
+Parses one text line into its prm values and arrays
+'''
+def parseRow(row):
+	values = {'time':parseTime(row[1])}
+	if np.isnan(values['time']):
+		raise ValueError('no time')
+	for key, col in PRM_COLUMNS:
+		values[key] = parseNumbers([row[col]])[0]
+	arrays = dict((key, parseArrays([row[col]])[0]) for key, col in ARRAY_COLUMNS)
+	if len(set(len(arr) for arr in arrays.values())) != 1:
+		raise ValueError('arrays of different lengths')
+	return values, arrays
+
+'''
+Radar name of a text history file, <m><d><yyyy>_<rad><chan>
+'''
+def radarName(filenm):
+	return filenm.rsplit('/', 1)[-1].split('_', 1)[1]
+
+'''
+Time of the first line with one, to put the files in order
+'''
+def firstTime(filenm):
+	with open(filenm) as f:
+		for line in f:
+			seconds = parseTime(line)
+			if not np.isnan(seconds):
+				return seconds
+	return 0
+
+'''
+Parses files in a pool of workers and appends them in time order to the
+binary day files of beam bmnum, skipping days that had binary history
+before the import started
+'''
+def importFiles(files, bmnum, workers, folder = HISTORY_DIR):
+	#the binary files are named with a '.'
+	files = [filenm for filenm in files if '_' in filenm.rsplit('/', 1)[-1] and \
+		'.' not in filenm.rsplit('/', 1)[-1]]
+	files.sort(key=lambda filenm: (radarName(filenm), firstTime(filenm)))
+	pool = multiprocessing.Pool(workers)
+	imported = set()
+	skipped = set()
+	beams = 0
+	start = time.time()
+	for filenm, prm, gates in pool.imap(parseFile, files):
+		name = radarName(filenm)
+		prm['bmnum'] = bmnum
+		if np.any(np.diff(prm['time']) < 0):
+			prm, gates = selectRecords(prm, gates, np.argsort(prm['time'], kind='mergesort'))
+		days = (prm['time'] // 86400).astype(np.int64)
+		for dayNum in np.unique(days):
+			day = datetime.date(1970, 1, 1) + datetime.timedelta(days=int(dayNum))
+			if (name, day) not in imported:
+				if (name, day) in skipped or hasDay(name, day, bmnum, folder):
+					skipped.add((name, day))
+					continue
+				imported.add((name, day))
+			dayPrm, dayGates = selectRecords(prm, gates, np.flatnonzero(days == dayNum))
+			appendArrays(dayPrefix(name, day, bmnum, folder), dayPrm, dayGates)
+			beams += len(dayPrm)
+		print('%s: %d beams' % (filenm, len(prm)))
+	pool.close()
+	pool.join()
+	print('imported %d beams from %d files into %d days in %.1fs, %d days already had binary history' % \
+		(beams, len(files), len(imported), time.time() - start, len(skipped)))
+
+def main():
+	bmnum = None
+	workers = multiprocessing.cpu_count()
+	folder = HISTORY_DIR
+	files = []
+	for argL in sys.argv[1:]:
+		if argL.startswith('beam='):
+			bmnum = int(argL[len('beam='):])
+		elif argL.startswith('workers='):
+			workers = int(argL[len('workers='):])
+		elif argL.startswith('folder='):
+			folder = argL[len('folder='):]
+		else:
+			files.append(argL)
+	if bmnum is None:
+		print('beam= is needed, the beam number of the time plot the files were written for')
+		sys.exit(1)
+	importFiles(files, bmnum, workers, folder)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,96 @@
+# incremental splitter for the stream of JSON records pydmap_daemon.py
+# sends, one object after another with nothing between them
+# connection.py feeds it every chunk twisted hands over and gets back
+# each complete record exactly once. Only the bytes that arrive are
+# scanned, the position, brace depth and string state are kept between
+# chunks so no record is searched twice.
+
+import re
+
+# largest record buffered before it is thrown away
+MAX_LENGTH = 16 * 1024 * 1024
+
+# characters that matter outside and inside of a string
+OUTSIDE = re.compile(r'[{}"]')
+INSIDE = re.compile(r'["\\]')
+
+OPEN = ord('{')
+QUOTE = ord('"')
+BACKSLASH = ord('\\')
+
+class JsonSplitter(object):
+	def __init__(self, maxlength = MAX_LENGTH):
+		self.buf = bytearray()
+		self.maxlength = maxlength
+		# start of the record being scanned and the next byte to look at
+		self.start = 0
+		self.pos = 0
+		self.depth = 0
+		self.instring = False
+		self.records = 0
+		self.dropped = 0
+		self.discarded = 0
+
+	'''
+	Adds a chunk of the stream and returns the list of records
+	it completed as strings
+	'''
+	def feed(self, data):
+		buf = self.buf
+		buf.extend(data)
+		end = len(buf)
+		msgs = []
+		while self.pos < end:
+			if self.depth == 0:
+				#anything between records is skipped
+				i = buf.find('{', self.pos)
+				if i == -1:
+					self.discarded += end - self.pos
+					self.start = self.pos = end
+					break
+				self.discarded += i - self.pos
+				self.start = i
+				self.pos = i + 1
+				self.depth = 1
+			elif self.instring:
+				m = INSIDE.search(buf, self.pos)
+				if m is None:
+					self.pos = end
+				elif buf[m.start()] == BACKSLASH:
+					if m.end() == end:
+						#look at the escape again once the next byte is here
+						self.pos = m.start()
+						break
+					self.pos = m.end() + 1
+				else:
+					self.instring = False
+					self.pos = m.end()
+			else:
+				m = OUTSIDE.search(buf, self.pos)
+				if m is None:
+					self.pos = end
+					break
+				self.pos = m.end()
+				c = buf[m.start()]
+				if c == QUOTE:
+					self.instring = True
+				elif c == OPEN:
+					self.depth += 1
+				else:
+					self.depth -= 1
+					if self.depth == 0:
+						msgs.append(str(buf[self.start:self.pos]))
+						self.records += 1
+						self.start = self.pos
+
+		if self.depth > 0 and self.pos - self.start > self.maxlength:
+			self.dropped += 1
+			self.depth = 0
+			self.instring = False
+			self.start = self.pos
+		#forget consumed bytes once they are at least half the buffer
+		if self.start > 0 and self.start * 2 >= len(buf):
+			del buf[:self.start]
+			self.pos -= self.start
+			self.start = 0
+		return msgs
@@ -0,0 +1,117 @@
+# counters, gauges and latency histograms for the ingest path
+# rendered in the Prometheus text format, pydmap_daemon.py writes
+# them to a file that node_exporter's textfile collector or a person
+# with cat can read
+
+import os
+
+# latency buckets in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1., 5.)
+
+def formatLabels(labels, extra = None):
+	items = list(labels)
+	if extra is not None:
+		items.append(extra)
+	if not items:
+		return ''
+	return '{%s}' % (','.join('%s="%s"' % (key, val) for key, val in items))
+
+class Counter(object):
+	kind = 'counter'
+	def __init__(self):
+		self.value = 0
+
+	def inc(self, n = 1):
+		self.value += n
+
+	def render(self, name, labels):
+		return ['%s%s %s' % (name, formatLabels(labels), self.value)]
+
+class Gauge(Counter):
+	kind = 'gauge'
+	def set(self, value):
+		self.value = value
+
+class Histogram(object):
+	kind = 'histogram'
+	def __init__(self, buckets = BUCKETS):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.count = 0
+		self.sum = 0.
+
+	def observe(self, value):
+		self.count += 1
+		self.sum += value
+		for i, bound in enumerate(self.buckets):
+			if value <= bound:
+				self.counts[i] += 1
+				break
+
+	def render(self, name, labels):
+		lines = []
+		total = 0
+		for bound, count in zip(self.buckets, self.counts):
+			total += count
+			lines.append('%s_bucket%s %d' % (name, formatLabels(labels, ('le', bound)), total))
+		lines.append('%s_bucket%s %d' % (name, formatLabels(labels, ('le', '+Inf')), self.count))
+		lines.append('%s_sum%s %f' % (name, formatLabels(labels), self.sum))
+		lines.append('%s_count%s %d' % (name, formatLabels(labels), self.count))
+		return lines
+
+'''
+Holds every metric by name and label set.
+counter(), gauge() and histogram() create the metric on first use
+and return the same object afterwards.
+'''
+class Registry(object):
+	def __init__(self):
+		self.families = {}
+		self.order = []
+
+	def get(self, cls, name, doc, labels):
+		if name not in self.families:
+			self.families[name] = (cls.kind, doc, {})
+			self.order.append(name)
+		key = tuple(sorted(labels.items()))
+		series = self.families[name][2]
+		if key not in series:
+			series[key] = cls()
+		return series[key]
+
+	def counter(self, name, doc, **labels):
+		return self.get(Counter, name, doc, labels)
+
+	def gauge(self, name, doc, **labels):
+		return self.get(Gauge, name, doc, labels)
+
+	def histogram(self, name, doc, **labels):
+		return self.get(Histogram, name, doc, labels)
+
+	'''
+	Forgets every series of a metric, for gauges whose label sets
+	come and go
+	'''
+	def clear(self, name):
+		if name in self.families:
+			self.families[name][2].clear()
+
+	def render(self):
+		lines = []
+		for name in self.order:
+			kind, doc, series = self.families[name]
+			lines.append('# HELP %s %s' % (name, doc))
+			lines.append('# TYPE %s %s' % (name, kind))
+			for key in sorted(series):
+				lines.extend(series[key].render(name, key))
+		return '\n'.join(lines) + '\n'
+
+	'''
+	Writes the metrics to filenm, replacing it in one step so readers
+	never see a partial file
+	'''
+	def writeFile(self, filenm):
+		tmp = filenm + '.tmp'
+		with open(tmp, 'w') as f:
+			f.write(self.render())
+		os.rename(tmp, filenm)
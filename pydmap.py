@@ -0,0 +1,259 @@
+# dmap record decoding for pydmap_daemon.py, which reads every radar's
+# feed without blocking through DmapReader
+# 7/1/2015
+# jon klein, jtklein@alaska.edu
+
+import numpy as np
+import socket
+import json
+
+DATACODE = 33
+DATACHAR = 1
+DATASHORT = 2
+DATAINT = 3
+DATAFLOAT = 4
+DATADOUBLE = 8
+DATASTRING = 9
+DATALONG = 10
+DATAUCHAR = 16
+DATAUSHORT = 17
+DATAUINT = 18
+DATAULONG = 19
+DATAMAP = 255
+NULL = chr(0)
+
+# numpy type for every dmap type, dmap is little-endian on the wire.
+# DATAMAP (nested records) is not supported
+DTYPE_CODES = { \
+    DATACHAR:np.dtype('<i1'),\
+    DATASHORT:np.dtype('<i2'),\
+    DATAINT:np.dtype('<i4'),\
+    DATAFLOAT:np.dtype('<f4'),\
+    DATADOUBLE:np.dtype('<f8'),\
+    DATASTRING:str,\
+    DATALONG:np.dtype('<i8'),\
+    DATAUCHAR:np.dtype('<u1'),\
+    DATAUSHORT:np.dtype('<u2'),\
+    DATAUINT:np.dtype('<u4'),\
+    DATAULONG:np.dtype('<u8')}
+
+# the fields basic_gui.py reads out of a record (connection.processDict
+# and the prm, fit and beam classes), everything else can be skipped
+GUI_FIELDS = frozenset([ \
+    'cp', 'stid', 'bmnum', 'channel', \
+    'time.yr', 'time.mo', 'time.dy', 'time.hr', 'time.mt', 'time.sc', \
+    'nave', 'combf', 'lagfr', 'smsep', 'ercod', 'bmazm', 'scan', 'rxrise', \
+    'intt.sc', 'intt.us', 'mpinc', 'mppul', 'mplgs', 'mplgexs', 'nrang', \
+    'frang', 'rsep', 'xcf', 'tfreq', 'ifmode', 'atten', \
+    'noise.mean', 'noise.sky', 'noise.search', 'stat.lopwr', 'stat.agc', \
+    'npnts', 'slist', 'v', 'p_l', 'w_l', 'gflg', 'elv', 'phi0'])
+
+# seconds before a lost feed is reconnected
+RESTART_DELAY = 5
+
+# initial size of the socket buffer, grows if a single read needs more
+BUFSIZE = 65536
+
+# bytes of the record header code 65537 as they appear on the wire
+HEADER = np.array([65537], dtype='<i4').tostring()
+# limits on sze, snum and anum for a header to be believed
+MAX_RECORD = 16 * 1024 * 1024
+MAX_FIELDS = 4096
+
+class DmapReader(object):
+    '''
+    Buffered reader for a dmap socket.
+
+    Bytes are pulled off the socket in bulk with recv_into into a
+    reusable bytearray and next_record() hands back each complete
+    record for parse_record to decode. recvs and nbytes count the socket
+    calls made and the bytes received. If tee is set it is called
+    with a view of every chunk received, before it is decoded.
+
+    When the stream is misaligned sync() skips ahead to the next
+    plausible header, resyncs and discarded count how often that
+    happened and the bytes thrown away. resynced holds the bytes
+    discarded by the last completed resync until the caller clears it.
+    '''
+    def __init__(self, sock, bufsize = BUFSIZE):
+        self.sock = sock
+        self.buf = bytearray(bufsize)
+        self.start = 0
+        self.end = 0
+        self.recvs = 0
+        self.nbytes = 0
+        self.tee = None
+        self.resyncs = 0
+        self.discarded = 0
+        self.resynced = 0
+        self.syncing = False
+
+    def reserve(self, n):
+        # make sure n unread bytes fit behind self.start, moving the
+        # unread bytes to the front or growing the buffer if needed
+        if self.start + n <= len(self.buf):
+            return
+        count = self.end - self.start
+        if n > len(self.buf):
+            buf = bytearray(max(n, 2 * len(self.buf)))
+            buf[:count] = self.buf[self.start:self.end]
+            self.buf = buf
+        else:
+            self.buf[:count] = self.buf[self.start:self.end]
+        self.start = 0
+        self.end = count
+
+    def recv(self, n = 1):
+        # a single recv_into call into the free end of the buffer, with
+        # room made for at least n more bytes
+        self.reserve(self.end - self.start + n)
+        view = memoryview(self.buf)
+        nrecv = self.sock.recv_into(view[self.end:])
+        if nrecv == 0:
+            raise socket.error('dmap connection closed')
+        if self.tee is not None:
+            self.tee(view[self.end:self.end + nrecv])
+        del view
+        self.end += nrecv
+        self.recvs += 1
+        self.nbytes += nrecv
+        return nrecv
+
+    def discard(self, n):
+        if not self.syncing:
+            self.syncing = True
+            self.resyncs += 1
+            self.resynced = 0
+        self.start += n
+        self.discarded += n
+        self.resynced += n
+
+    def sync(self):
+        # line the buffer up on a plausible record header, searching the
+        # buffered bytes for the header code at every byte offset.
+        # Returns False when more bytes are needed to find or check one
+        while self.end - self.start >= 16:
+            datacode, sze, snum, anum = np.frombuffer(self.buf, dtype=np.int32, count=4, offset=self.start)
+            if datacode == 65537 and 0 <= snum <= MAX_FIELDS and 0 <= anum <= MAX_FIELDS \
+                    and 16 + 3 * snum + 10 * anum <= sze <= MAX_RECORD:
+                self.syncing = False
+                return True
+            ind = self.buf.find(HEADER, self.start + 1, self.end)
+            if ind == -1:
+                # keep the last few bytes, they may start a header
+                self.discard(max(self.end - self.start - len(HEADER) + 1, 1))
+                return False
+            self.discard(ind - self.start)
+        return False
+
+    def next_record(self):
+        # pull the next complete record out of the bytes already
+        # buffered, without touching the socket. Returns None until
+        # all sze bytes of the record have arrived
+        if not self.sync():
+            return None
+        sze = np.frombuffer(self.buf, dtype=np.int32, count=1, offset=self.start + 4)[0]
+        if self.end - self.start < sze:
+            self.reserve(sze)
+            return None
+        record = self.buf[self.start:self.start + sze]
+        self.start += sze
+        return record
+
+def findnull(buf, off, sze):
+    end = buf.find(NULL, off, sze)
+    if end == -1:
+        raise ValueError('unterminated string in dmap record')
+    return end
+
+def typecode(buf, end, sze):
+    # the type code follows the NULL ending a field name
+    if end + 2 > sze:
+        raise ValueError('field name runs past the end of the dmap record')
+    return buf[end + 1]
+
+def parse_record(buf, fields = None):
+    '''
+    Decodes one complete dmap record held in buf, starting at the
+    header code and sze bytes long. If fields is given, only the
+    names in it are decoded, other fields are stepped over by their
+    size without being converted.
+
+    Field offsets are walked through the buffer and every scalar and
+    vector is decoded with numpy.frombuffer. Vectors are returned as
+    numpy views of buf, so buf must not be modified while they are
+    in use. Raises KeyError on an unsupported data type and ValueError
+    on a record that runs past its own end.
+    '''
+    if not isinstance(buf, bytearray):
+        buf = bytearray(buf)
+    scalars = {}
+    vectors = {}
+
+    datacode, sze, snum, anum = np.frombuffer(buf, dtype=np.int32, count=4)
+    off = 16
+
+    # read in scalars
+    for s in range(snum):
+        end = findnull(buf, off, sze)
+        name = str(buf[off:end])
+        dtype = DTYPE_CODES[typecode(buf, end, sze)]
+        off = end + 2
+        wanted = fields is None or name in fields
+        if dtype == str:
+            end = findnull(buf, off, sze)
+            if wanted:
+                scalars[name] = str(buf[off:end])
+            off = end + 1
+        else:
+            if off + dtype.itemsize > sze:
+                raise ValueError('scalar runs past the end of the dmap record')
+            if wanted:
+                scalars[name] = np.frombuffer(buf, dtype=dtype, count=1, offset=off)[0]
+            off += dtype.itemsize
+
+    # read in vectors
+    for a in range(anum):
+        end = findnull(buf, off, sze)
+        name = str(buf[off:end])
+        dtype = DTYPE_CODES[typecode(buf, end, sze)]
+        off = end + 2
+        if dtype == str:
+            raise KeyError('string vectors are not supported')
+        if off + 4 > sze:
+            raise ValueError('vector runs past the end of the dmap record')
+        ndims = int(np.frombuffer(buf, dtype=np.int32, count=1, offset=off)[0])
+        if ndims <= 0 or off + 4 * (ndims + 1) > sze:
+            raise ValueError('bad dimensions in dmap record')
+        dims = np.frombuffer(buf, dtype=np.int32, count=ndims, offset=off + 4)
+        off += 4 * (ndims + 1)
+        nitems = int(np.prod(dims.astype(np.int64)))
+        if np.any(dims < 0) or off + nitems * dtype.itemsize > sze:
+            raise ValueError('bad dimensions in dmap record')
+        if fields is not None and name not in fields:
+            off += nitems * dtype.itemsize
+            continue
+        payload = np.frombuffer(buf, dtype=dtype, count=nitems, offset=off)
+        off += nitems * dtype.itemsize
+        if ndims > 1:
+            payload = np.reshape(payload, tuple(dims[::-1]))
+        vectors[name] = payload
+
+    return scalars, vectors
+
+def createjson(scalars, vectors):
+    json_payload = {}
+
+    for scalar in scalars.keys():
+        payload = scalars[scalar]
+        if isinstance(payload, str):
+            json_payload[scalar] = payload
+        else:
+            json_payload[scalar] = np.asscalar(payload)
+
+    for vector in vectors.keys():
+        payload = vectors[vector]
+        # convert numpy array to list, recursively traverse and convert to jsonable data type..
+        payload = payload.tolist()
+        json_payload[vector] = payload
+    return json.dumps(json_payload)
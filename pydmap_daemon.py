@@ -0,0 +1,318 @@
+# serves every radar in radars.conf from one process
+# each upstream dmap feed is decoded and forwarded as JSON on the
+# radar's own serve port, and optionally as binary frames (dmapframe.py)
+# on a second port. All sockets share a single select loop
+
+import socket
+import select
+import errno
+import time
+import sys
+import traceback
+from pydmap import DmapReader, parse_record, createjson, RESTART_DELAY, GUI_FIELDS
+from dmapframe import encodeFrame
+from fanout import Broadcaster, QUEUE_SIZE
+from capture import CaptureWriter, CAPTURE_SIZE
+from metrics import Registry
+
+CONFIG = 'radars.conf'
+SELECT_TIMEOUT = 1.0
+# seconds between subscriber statistics lines
+STATS_INTERVAL = 60
+# seconds between writes of the metrics file
+METRICS_INTERVAL = 10
+
+ENCODERS = {'json':createjson, 'frame':encodeFrame}
+
+# per subscriber gauges, metric name, key in Subscriber.stats() and help
+SUBSCRIBER_METRICS = ( \
+	('dmap_subscriber_sent', 'sent', 'Records written to the subscriber'), \
+	('dmap_subscriber_dropped', 'dropped', 'Records dropped from the full queue of the subscriber'), \
+	('dmap_subscriber_queued', 'queued', 'Records waiting in the queue of the subscriber'), \
+	('dmap_subscriber_lag_seconds', 'lag', 'Age of the record being written to the subscriber'))
+
+'''
+One upstream dmap feed and the local ports it is served on
+'''
+class RadarFeed(object):
+	def __init__(self, name, host, port, serve, timeout, frame = '-', maxqueue = QUEUE_SIZE, \
+			capture = None, capturesize = CAPTURE_SIZE, fields = None, registry = None, verbose = False):
+		self.name = name
+		self.host = host
+		self.port = int(port)
+		self.timeout = float(timeout)
+		self.upstream = None
+		self.reader = None
+		self.connecting = False
+		self.retry = 0
+		self.lastdata = 0
+		self.laststats = time.time()
+		self.capture = None
+		if capture is not None:
+			self.capture = CaptureWriter(capture, name, capturesize)
+		self.fields = fields
+		self.verbose = verbose
+
+		if registry is None:
+			registry = Registry()
+		self.mRecords = registry.counter('dmap_records_total', 'Records decoded', radar=name)
+		self.mBytes = registry.counter('dmap_bytes_total', 'Bytes received from the dmap feed', radar=name)
+		self.mResyncs = registry.counter('dmap_resyncs_total', 'Times the feed was resynchronised on a header', radar=name)
+		self.mDiscarded = registry.counter('dmap_discarded_bytes_total', 'Bytes thrown away while resynchronising', radar=name)
+		self.mUnsupported = registry.counter('dmap_dropped_records_total', 'Records that could not be decoded', radar=name, reason='unsupported')
+		self.mMalformed = registry.counter('dmap_dropped_records_total', 'Records that could not be decoded', radar=name, reason='malformed')
+		self.mFailures = registry.counter('dmap_feed_failures_total', 'Exceptions that closed and restarted the feed', radar=name)
+		self.mConnected = registry.gauge('dmap_upstream_connected', '1 while the dmap feed is connected', radar=name)
+		self.mDecode = registry.histogram('dmap_receive_decode_seconds', 'Time from receiving the end of a record to it being decoded', radar=name)
+		self.mSend = registry.histogram('dmap_decode_send_seconds', 'Time from decoding a record to it being encoded and handed to every subscriber', radar=name)
+
+		self.outlets = [('json', Broadcaster(name, serve, maxqueue))]
+		if frame != '-':
+			self.outlets.append(('frame', Broadcaster(name, frame, maxqueue)))
+
+	'''
+	Starts a non-blocking connect to the upstream dmap feed
+	'''
+	def connect(self, now):
+		print('%s: connecting to %s:%d' % (self.name, self.host, self.port))
+		self.upstream = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.upstream.setblocking(0)
+		self.reader = DmapReader(self.upstream)
+		if self.capture is not None:
+			self.reader.tee = self.captureChunk
+		self.connecting = True
+		self.lastdata = now
+		try:
+			err = self.upstream.connect_ex((self.host, self.port))
+		except socket.error as e:
+			err = e.errno
+		if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+			self.closeUpstream(now, 'connect failed: %s' % (errno.errorcode.get(err, err)))
+
+	def connected(self, now):
+		err = self.upstream.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+		if err:
+			self.closeUpstream(now, 'connect failed: %s' % (errno.errorcode.get(err, err)))
+			return
+		print('%s: connected!' % (self.name))
+		self.mConnected.set(1)
+		self.connecting = False
+		self.lastdata = now
+
+	def closeUpstream(self, now, reason):
+		print('%s: %s, restarting dmap feed' % (self.name, reason))
+		if self.upstream:
+			self.upstream.close()
+		self.upstream = None
+		self.reader = None
+		self.connecting = False
+		self.mConnected.set(0)
+		self.retry = now + RESTART_DELAY
+
+	'''
+	Reconnects the feed once the restart delay has passed, drops it
+	if nothing has arrived within its timeout and prints the
+	subscriber statistics
+	'''
+	def tick(self, now):
+		if self.upstream is None:
+			if now >= self.retry:
+				self.connect(now)
+		elif now - self.lastdata > self.timeout:
+			self.closeUpstream(now, 'timed out on dmap feed')
+		if self.capture is not None:
+			try:
+				self.capture.flush()
+			except Exception as e:
+				self.stopCapture(e)
+		if now - self.laststats > STATS_INTERVAL:
+			self.laststats = now
+			if self.mResyncs.value:
+				print('%s: %d resyncs, %d bytes discarded' % (self.name, self.mResyncs.value, self.mDiscarded.value))
+			for encoding, outlet in self.outlets:
+				for st in outlet.stats():
+					print('%s: %s %s sent %d (%d bytes) dropped %d queued %d lag %.1fs' % \
+						(self.name, encoding, st['addr'], st['sent'], st['bytes'],
+						st['dropped'], st['queued'], st['lag']))
+
+	'''
+	Tees a received chunk into the capture
+	'''
+	def captureChunk(self, chunk):
+		try:
+			self.capture.write(chunk, time.time())
+		except Exception as e:
+			self.stopCapture(e)
+
+	'''
+	Gives up on the capture after an error writing it, such as a full
+	disk, the feed keeps being served without it
+	'''
+	def stopCapture(self, e):
+		print('%s: capture stopped, %s: %s' % (self.name, type(e).__name__, e))
+		try:
+			self.capture.close()
+		except Exception:
+			pass
+		self.capture = None
+		if self.reader is not None:
+			self.reader.tee = None
+
+	'''
+	Calls handler, an exception in it is printed, counted and closes the
+	upstream feed to be reconnected, instead of stopping every other feed
+	served by the process
+	'''
+	def guard(self, handler, now):
+		try:
+			handler(now)
+		except Exception as e:
+			traceback.print_exc()
+			self.mFailures.inc()
+			self.closeUpstream(now, 'failed with %s: %s' % (type(e).__name__, e))
+
+	'''
+	Adds the handlers of the upstream socket, called through guard, and
+	of the outlets, which guard their own subscribers
+	'''
+	def register(self, rhandlers, whandlers):
+		if self.upstream is not None:
+			if self.connecting:
+				whandlers[self.upstream] = lambda now: self.guard(self.connected, now)
+			else:
+				rhandlers[self.upstream] = lambda now: self.guard(self.readable, now)
+		for encoding, outlet in self.outlets:
+			outlet.register(rhandlers, whandlers)
+
+	'''
+	Reads whatever the upstream socket has and forwards every
+	complete record
+	'''
+	def readable(self, now):
+		try:
+			nrecv = self.reader.recv()
+		except socket.error as e:
+			if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+				return
+			self.closeUpstream(now, str(e))
+			return
+		self.lastdata = now
+		self.mBytes.inc(nrecv)
+		record = self.reader.next_record()
+		while record is not None:
+			try:
+				scalars, vectors = parse_record(record, self.fields)
+			except KeyError:
+				print('%s: Unsupported data type, skipping the entry' % (self.name))
+				self.mUnsupported.inc()
+			except ValueError:
+				print('%s: Malformed record, skipping the entry' % (self.name))
+				self.mMalformed.inc()
+			else:
+				decoded = time.time()
+				self.mRecords.inc()
+				self.mDecode.observe(decoded - now)
+				self.publish(scalars, vectors, now)
+				self.mSend.observe(time.time() - decoded)
+			record = self.reader.next_record()
+		if self.reader.resynced and not self.reader.syncing:
+			print('%s: resynced on header after discarding %d bytes' % (self.name, self.reader.resynced))
+			self.mResyncs.inc()
+			self.mDiscarded.inc(self.reader.resynced)
+			self.reader.resynced = 0
+
+	'''
+	Encodes a record for every outlet that has subscribers and
+	queues it to each of them
+	'''
+	def publish(self, scalars, vectors, now):
+		for encoding, outlet in self.outlets:
+			if not outlet.active():
+				continue
+			msg = ENCODERS[encoding](scalars, vectors)
+			if self.verbose and encoding == 'json':
+				print msg
+			outlet.publish(msg, now)
+
+'''
+Reads the radar table, one radar per line:
+name host port serve_port timeout [frame_port]
+'''
+def readConfig(filenm, **options):
+	radars = []
+	with open(filenm) as f:
+		for line in f:
+			line = line.split('#')[0].split()
+			if line:
+				if len(line) < 6:
+					line.append('-')
+				radars.append(RadarFeed(*line, **options))
+	return radars
+
+'''
+Sets the per subscriber gauges and writes the metrics file
+'''
+def writeMetrics(radars, registry, filenm):
+	for name, key, doc in SUBSCRIBER_METRICS:
+		registry.clear(name)
+	for radar in radars:
+		for encoding, outlet in radar.outlets:
+			registry.gauge('dmap_outlet_failures', 'Exceptions that closed a subscriber or hit the listener',
+				radar=radar.name, encoding=encoding).set(outlet.failures)
+			for st in outlet.stats():
+				for name, key, doc in SUBSCRIBER_METRICS:
+					registry.gauge(name, doc, radar=radar.name, encoding=encoding,
+						subscriber=st['addr']).set(st[key])
+	registry.writeFile(filenm)
+
+def serve(radars, registry = None, metrics = None):
+	lastmetrics = 0
+	while True:
+		now = time.time()
+		rhandlers = {}
+		whandlers = {}
+		for radar in radars:
+			radar.guard(radar.tick, now)
+			radar.register(rhandlers, whandlers)
+		if metrics is not None and now - lastmetrics > METRICS_INTERVAL:
+			lastmetrics = now
+			writeMetrics(radars, registry, metrics)
+
+		readable, writable, _ = select.select(rhandlers.keys(), whandlers.keys(), [], SELECT_TIMEOUT)
+		now = time.time()
+		for sock in writable:
+			whandlers[sock](now)
+		for sock in readable:
+			rhandlers[sock](now)
+
+def main():
+	filenm = CONFIG
+	metrics = None
+	registry = Registry()
+	options = {'registry':registry}
+	for argL in sys.argv[1:]:
+		if argL.startswith('config='):
+			filenm = argL[len('config='):]
+		elif argL.startswith('queue='):
+			options['maxqueue'] = int(argL[len('queue='):])
+		elif argL.startswith('capturesize='):
+			options['capturesize'] = int(argL[len('capturesize='):]) * 1024 * 1024
+		elif argL.startswith('capture='):
+			options['capture'] = argL[len('capture='):]
+		elif argL.startswith('fields='):
+			fields = argL[len('fields='):]
+			if fields == 'all':
+				fields = None
+			elif fields == 'gui':
+				fields = GUI_FIELDS
+			else:
+				fields = frozenset(fields.split(','))
+			options['fields'] = fields
+		elif argL.startswith('metrics='):
+			metrics = argL[len('metrics='):]
+		elif argL.startswith('verbose='):
+			options['verbose'] = argL[len('verbose='):] == '1'
+	serve(readConfig(filenm, **options), registry, metrics)
+
+if __name__ == '__main__':
+	main()
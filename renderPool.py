@@ -0,0 +1,274 @@
+# rendering of the geo, fan and time plots in worker processes
+# the plotting threads in connection.py only take a compact snapshot of
+# the beams to draw and hand it to a pool of processes, so the plots of
+# one radar, and of different radars, are drawn on separate cores and
+# never share pyplot state with each other or with the twisted reactor.
+# Every worker keeps its own figures and, per radar and scan geometry,
+# the site, fields of view and map, which take seconds to build and tens
+# of megabytes to hold. The jobs of a radar only go to the workers it is
+# given, one when there are at least as many radars as workers, so each
+# map is held by one worker rather than by all of them.
+# With workers=0 the same functions run inline in the plotting threads.
+# The render functions return the errors they hit as (message, error)
+# pairs and the plotting threads log them, rate limited by eventLog.py.
+
+import sys
+import datetime
+import multiprocessing
+from threading import Lock
+import matplotlib.pyplot as plot
+from davitpy.pydarn.sdio.radDataTypes import beamData
+from davitpy.utils.plotUtils import mapObj, geoLoc
+from radarPos import RadarPos
+from warmStart import loadMap, saveMap
+from geoJS import plotFan
+from fgpJS import plotFgpJson
+from rtiJS import plotRti
+from rtiRing import RtiRing
+
+# one worker each for the geo, fan and time plots of a radar
+WORKERS = 3
+
+# beam attributes copied into snapshots
+BEAM_FIELDS = ('bmnum', 'time', 'cp', 'stid')
+PRM_FIELDS = ('nrang', 'rsep', 'frang', 'tfreq', 'noisesearch', 'noisesky', \
+	'nave', 'inttsc', 'ifmode')
+FIT_FIELDS = ('slist', 'v', 'p_l', 'w_l', 'gflg', 'elv', 'phi0')
+
+# per process caches, figures by (radar, product),
+# (site, map, fovs, dist) by (radar, gates, rsep, beams)
+# and read only RTI rings by file name
+figures = {}
+maps = {}
+rings = {}
+
+'''
+Copies what the plots use out of a beam as a tuple of values
+'''
+def snapshotBeam(myBeam):
+	return tuple(getattr(myBeam, key, None) for key in BEAM_FIELDS) + \
+		tuple(getattr(myBeam.prm, key, None) for key in PRM_FIELDS) + \
+		tuple(getattr(myBeam.fit, key, None) for key in FIT_FIELDS)
+
+def snapshotScan(myScan):
+	return [snapshotBeam(myBeam) for myBeam in myScan]
+
+def restoreBeam(snap):
+	myBeam = beamData()
+	nbeam = len(BEAM_FIELDS)
+	nprm = len(PRM_FIELDS)
+	for key, val in zip(BEAM_FIELDS, snap[:nbeam]):
+		setattr(myBeam, key, val)
+	for key, val in zip(PRM_FIELDS, snap[nbeam:nbeam + nprm]):
+		setattr(myBeam.prm, key, val)
+	for key, val in zip(FIT_FIELDS, snap[nbeam + nprm:]):
+		setattr(myBeam.fit, key, val)
+	return myBeam
+
+'''
+Copy of the plot settings of basic_gui's fan, geo or time dictionary
+for a job, the figures are kept by the process that draws them
+'''
+def plotOpts(settings):
+	return dict(settings)
+
+def getFigures(rad, product, count):
+	key = (rad, product)
+	if key not in figures:
+		figures[key] = [plot.figure() for i in range(count)]
+	return figures[key]
+
+'''
+Site, map, fields of view and dist of a radar for a scan geometry,
+built once per process, or once altogether when they are saved to
+the warm start folder
+'''
+def getMap(rad, maxgates, rsep, maxbeams, warm = None):
+	key = (rad, maxgates, rsep, maxbeams)
+	if key not in maps and warm:
+		value = loadMap(warm, key)
+		if value is not None:
+			maps[key] = value
+	if key not in maps:
+		site = RadarPos(code = rad)
+		site.tval = datetime.datetime.utcnow()
+		if rsep is None:
+			rsep = site.rsep
+		lon_0, lat_0, fovs, dist, width, height = geoLoc(site, maxgates, rsep, maxbeams)
+		myMap = mapObj(coords='geo', projection='stere', lat_0=lat_0, lon_0=lon_0, \
+			width= width*1.3, height = height*1.3, anchor = 'N', grid =True, draw=True)
+		maps[key] = (site, myMap, fovs, dist)
+		if warm:
+			saveMap(warm, key, maps[key])
+	return maps[key]
+
+'''
+Draws and saves geo_<param>.png for every parameter, returns the errors hit
+'''
+def renderGeo(job):
+	try:
+		opts = job['opts']
+		site, myMap, fovs, dist = getMap(job['rad'], job['maxgates'], job['rsep'], job['maxbeams'], job['warm'])
+		myScan = [restoreBeam(snap) for snap in job['scan']]
+		myBeam = restoreBeam(job['beam'])
+		plotFan(myScan, [job['rad']],
+			fovs = fovs,
+			params=opts['param'],
+			gsct=opts['gsct'],
+			maxbeams = job['maxbeams'],
+			maxgates=job['maxgates'],
+			scales=opts['sc'],
+			drawEdge = opts['drawEdge'],
+			myFigs = getFigures(job['rad'], 'geo', len(opts['param'])),
+			bmnum = myBeam.bmnum,
+			site = site,
+			tfreq = myBeam.prm.tfreq,
+			noise = myBeam.prm.noisesearch,
+			nave = myBeam.prm.nave,
+			inttime = myBeam.prm.inttsc,
+			rTime=myBeam.time,
+			radN = job['name'],
+			dist = dist,
+			merGrid = opts['merGrid'],
+			merColor = opts['merColor'],
+			continentBorder = opts['continentBorder'],
+			waterColor = opts['waterColor'],
+			continentColor = opts['continentColor'],
+			backgColor = opts['backgColor'],
+			gridColor = opts['gridColor'],
+			filepath = job['filepath'],
+			myMap = myMap)
+	except:
+		return [('geographic plot missing info', str(sys.exc_info()[0]))]
+	return []
+
+'''
+Draws and saves fan_<param>.png, beam number vs gates, for every parameter,
+returns the errors hit
+'''
+def renderFan(job):
+	opts = job['opts']
+	myScan = [restoreBeam(snap) for snap in job['scan']]
+	myBeam = restoreBeam(job['beam'])
+	figs = getFigures(job['rad'], 'fan', len(opts['param']))
+	errors = []
+	for i in range(len(figs)):
+		try:
+			figs[i].clf()
+			plotFgpJson(myScan, job['rad'],
+				params=[opts['param'][i]],
+				gsct=opts['param'][i] == 'velocity',
+				scales=[opts['sc'][i]],
+				bmnum = myBeam.bmnum,
+				figure = figs[i],
+				tfreq = myBeam.prm.tfreq,
+				noise = myBeam.prm.noisesearch,
+				rTime=myBeam.time,
+				radN = job['name'])
+			figs[i].savefig("%sfan_%s" % (job['filepath'], opts['param'][i]))
+		except:
+			errors.append(('fan plot missing info', str(sys.exc_info()[0])))
+	return errors
+
+def getRing(filenm):
+	if filenm not in rings:
+		rings[filenm] = RtiRing(filenm, readonly = True)
+	return rings[filenm]
+
+'''
+Draws and saves time.png for the last day of the time plot beam,
+read from the radar's RTI ring, returns the errors hit. The plot is
+in gate coordinates, so it needs no map or fields of view
+'''
+def renderTime(job):
+	try:
+		opts = job['opts']
+		fig = getFigures(job['rad'], 'time', 1)[0]
+		fig.clf()
+		plotRti(getRing(job['ring']).window(job['rTime'] - datetime.timedelta(days=1)),
+			job['rad'],
+			params=opts['param'],
+			scales=opts['sc'],
+			gsct=opts['gsct'],
+			bmnum = job['bmnum'],
+			figure = fig,
+			rTime = job['rTime'],
+			title = job['name'])
+		fig.savefig("%stime" % (job['filepath']))
+	except:
+		return [('time plot missing info', str(sys.exc_info()[0]))]
+	return []
+
+'''
+Draws job['text'] on a red background into every file of job['files'],
+the Lost Connection and No Data images, returns the errors hit
+'''
+def renderText(job):
+	try:
+		fig = getFigures(job['rad'], 'text', 1)[0]
+		fig.clf()
+		fig.text(0.5,0.5,job['text'],backgroundcolor='r',
+			size='x-large',style='oblique',ha='center',va='center')
+		for filenm in job['files']:
+			fig.savefig(filenm)
+	except:
+		return [('%s image not saved' % (job['text']), str(sys.exc_info()[0]))]
+	return []
+
+'''
+Result of a job run inline, looks like multiprocessing's AsyncResult
+'''
+class InlineResult(object):
+	def __init__(self, value):
+		self.value = value
+
+	def get(self, timeout = None):
+		return self.value
+
+'''
+Render processes shared by every plotting thread, each a pool of one
+so the jobs of a radar can be sent to the workers that hold its maps.
+Radar i of rads gets workers i, i + len(rads), ... and takes them in turn
+'''
+class RenderPool(object):
+	def __init__(self, workers = WORKERS, rads = ()):
+		self.workers = workers
+		self.pools = [multiprocessing.Pool(1) for i in range(workers)]
+		self.rads = []
+		for rad in rads:
+			if rad not in self.rads:
+				self.rads.append(rad)
+		self.turns = {}
+		self.lock = Lock()
+
+	'''
+	Worker the next job of radar rad goes to
+	'''
+	def slot(self, rad):
+		with self.lock:
+			if rad not in self.rads:
+				self.rads.append(rad)
+			i = self.rads.index(rad)
+			if len(self.rads) >= self.workers:
+				return i % self.workers
+			slots = range(i, self.workers, len(self.rads))
+			turn = self.turns.get(rad, 0)
+			self.turns[rad] = turn + 1
+			return slots[turn % len(slots)]
+
+	'''
+	Runs func(job) in a worker of job['rad'], callback is called with its
+	return value, from the pool's result thread, once it is done
+	'''
+	def submit(self, func, job, callback = None):
+		if not self.pools:
+			result = InlineResult(func(job))
+			if callback is not None:
+				callback(result.value)
+			return result
+		return self.pools[self.slot(job['rad'])].apply_async(func, (job,), callback = callback)
+
+	def close(self):
+		for pool in self.pools:
+			pool.terminate()
+		self.pools = []
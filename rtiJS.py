@@ -46,7 +46,7 @@ from davitpy.utils import plotUtils
 
 
 
-def plotRti(myBeamList,rad,bmnum=7, params=['velocity','power','width'],\
+def plotRti(window,rad,bmnum=7, params=['velocity','power','width'],\
 	scales=[], channel='a',coords='gate',colors='lasse',yrng=-1,\
 	gsct=False,lowGray=False, filtered=False,tFreqBands=[],\
 	figure=None,xtick_size=9,ytick_size=9,myFov = None,\
@@ -54,7 +54,7 @@ def plotRti(myBeamList,rad,bmnum=7, params=['velocity','power','width'],\
   """create an rti plot for a secified radar and time period
 
   **Args**:
-  	* **myBeamList** List of beam information
+  	* **window** columns of the beams to plot, from rtiRing.RtiRing.window
     * **rad** (str): the 3 letter radar code, e.g. 'bks'
     * **[bmnum] (int)**: The beam to plot.  default: 7
     * **[params]** (list): a list of the fit parameters to plot, allowable values are: ['velocity', 'power', 'width', 'elevation', 'phi0'].  default: ['velocity', 'power', 'width']
@@ -83,7 +83,7 @@ def plotRti(myBeamList,rad,bmnum=7, params=['velocity','power','width'],\
     
       import datetime as dt
       import matplotlib.pyplot as plot
-      plotRti(myBeamList,'ade',params=['velocity','power','width'],
+      plotRti(ring.window(timeThen),'ade',params=['velocity','power','width'],
 			scales=[[-1000,1000],[0,30],[0,500]],gsct=True,
 			bmnum = 8,figure = plot.figure(),rTime = timeNow,
 			title = 'Adak East',myFov = fovs)
@@ -134,156 +134,103 @@ def plotRti(myBeamList,rad,bmnum=7, params=['velocity','power','width'],\
       tbands.append(band)
 
 
-  if not myBeamList:
+  if window is None or len(window['time']) == 0:
     logging.debug('error, no data available for the requested time/radar/filetype combination')
     return None
 
-  #initialize empty lists
-  vel,pow,wid,elev,phi0,times,freq,cpid,nave,nsky,nsch,slist,mode,rsep,nrang,frang,gsflg = \
-        [],[],[],[],[],[],[],[],[],[],[],[],[],[],[],[],[]
-  for i in range(len(tbands)):
-    times.append([])
-    cpid.append([])
-    nave.append([])
-    nsky.append([])
-    rsep.append([])
-    nrang.append([])
-    frang.append([])
-    nsch.append([])
-    freq.append([])
-    slist.append([])
-    mode.append([])
-    vel.append([])
-    pow.append([])
-    wid.append([])
-    elev.append([])
-    phi0.append([])
-    gsflg.append([])
-  timeThen = datetime.datetime.utcnow() - datetime.timedelta(days=1)
-  #read the parameters of interest
-  for myBeam in myBeamList:
-    if myBeam.time > timeThen:
-      ids = myBeam.stid
-      times[i].append(myBeam.time)
-      cpid[i].append(myBeam.cp)
-      nave[i].append(myBeam.prm.nave)
-      nsky[i].append(myBeam.prm.noisesky)
-      rsep[i].append(myBeam.prm.rsep)
-      nrang[i].append(myBeam.prm.nrang)
-      frang[i].append(myBeam.prm.frang)
-      nsch[i].append(myBeam.prm.noisesearch)
-      freq[i].append(myBeam.prm.tfreq/1e3)
-      slist[i].append(myBeam.fit.slist)
-      mode[i].append(myBeam.prm.ifmode)
-      if('velocity' in params): vel[i].append(myBeam.fit.v)
-      if('power' in params): pow[i].append(myBeam.fit.p_l)
-      if('width' in params): wid[i].append(myBeam.fit.w_l)
-      if('elevation' in params): elev[i].append(myBeam.fit.elv)
-      if('phi0' in params): phi0[i].append(myBeam.fit.phi0)
-      gsflg[i].append(myBeam.fit.gflg)
-
-
-  for fplot in range(len(tbands)):
-
-    #get/create a figure
-    rtiFig = figure
-    #give the plot a title
-    rtiTitle(rtiFig,rTime,title,rad,bmnum)
-    #plot the noise bar
-    plotNoise(rtiFig,times[fplot],nsky[fplot],nsch[fplot])
-    #plot the frequency bar
-    plotFreq(rtiFig,times[fplot],freq[fplot],nave[fplot])
-    #plot the cpid bar
-    plotCpid(rtiFig,times[fplot],cpid[fplot],mode[fplot])
-    
-    #plot each of the parameter panels
-    figtop = .77
-    figheight = .72/len(params)
-    for p in range(len(params)):
-      if(params[p] == 'velocity'): pArr = vel[fplot]
-      elif(params[p] == 'power'): pArr = pow[fplot]
-      elif(params[p] == 'width'): pArr = wid[fplot]
-      elif(params[p] == 'elevation'): pArr = elev[fplot]
-      elif(params[p] == 'phi0'): pArr = phi0[fplot]
-      time.sleep(0.1)
-      pos = [.1,figtop-figheight*(p+1)+.02,.76,figheight-.02]
-      
-      #draw the axis
-      ax = drawAxes(rtiFig,times[fplot],rad,cpid[fplot],bmnum,nrang[fplot],frang[fplot],rsep[fplot],ids,p==len(params)-1,yrng=yrng,coords=coords,\
-                    pos=pos,xtick_size=xtick_size,ytick_size=ytick_size,xticks=xticks,axvlines=axvlines, myFov=myFov)
-  
-      
-      if(pArr == []): continue
+  #the columns of the window, its prm values as lists
+  times = [datetime.datetime.utcfromtimestamp(t) for t in window['time'].tolist()]
+  ids = int(window['stid'][-1])
+  cpid = window['cp'].tolist()
+  nave = window['nave'].tolist()
+  nsky = window['noisesky'].tolist()
+  nsch = window['noisesearch'].tolist()
+  freq = (window['tfreq']/1e3).tolist()
+  mode = window['ifmode'].tolist()
+  rsep = window['rsep'].tolist()
+  nrang = window['nrang'].tolist()
+  frang = window['frang'].tolist()
+
+  #a blank column is drawn after each beam followed by more than 4 minutes without data
+  x = date2num(times)
+  gaps = numpy.diff(x) > 4./1440.
+  rows = numpy.arange(len(x)) + numpy.concatenate(([0], numpy.cumsum(gaps)))
+  tcnt = len(x) + int(gaps.sum())
+  xEdges = numpy.empty(tcnt+1)
+  xEdges[rows] = x
+  xEdges[rows[:-1][gaps]+1] = x[:-1][gaps] + 1./1440.
+  xEdges[tcnt] = x[-1] + 1./1440.
+
+  #get/create a figure
+  rtiFig = figure
+  #give the plot a title
+  rtiTitle(rtiFig,rTime,title,rad,bmnum)
+  #plot the noise bar
+  plotNoise(rtiFig,times,nsky,nsch)
+  #plot the frequency bar
+  plotFreq(rtiFig,times,freq,nave)
+  #plot the cpid bar
+  plotCpid(rtiFig,times,cpid,mode)
+
+  #plot each of the parameter panels
+  figtop = .77
+  figheight = .72/len(params)
+  for p in range(len(params)):
+    pos = [.1,figtop-figheight*(p+1)+.02,.76,figheight-.02]
+
+    #draw the axis
+    ax = drawAxes(rtiFig,times,rad,cpid,bmnum,nrang,frang,rsep,ids,p==len(params)-1,yrng=yrng,coords=coords,\
+                  pos=pos,xtick_size=xtick_size,ytick_size=ytick_size,xticks=xticks,axvlines=axvlines, myFov=myFov)
+
+    rmax = min(max(nrang), window[params[p]].shape[1])
+    data = numpy.empty((tcnt,rmax))
+    data[:] = numpy.nan
+    data[rows] = window[params[p]][:,:rmax]
+    if gsct and params[p] != 'power':
+      gs = numpy.zeros((tcnt,rmax),dtype=bool)
+      gs[rows] = window['gflg'][:,:rmax] == 1
+      data[gs & ~numpy.isnan(data)] = -100000.
+    tmpdata = numpy.ma.masked_invalid(data)
+
+    if (coords != 'gate' and coords != 'rng'):
+      if myFov is None:
+        site    = RadarPos(ids)
+        myFov   = radFov.fov(site=site,ngates=rmax,nbeams=site.maxbeam,rsep=rsep[0],coords=coords)
+      myLat   = myFov.latCenter[bmnum]
+      myLon   = myFov.lonCenter[bmnum]
+
+    if(coords == 'gate'): y = numpy.linspace(0,rmax,rmax+1)
+    elif(coords == 'rng'): y = numpy.linspace(frang[0],rmax*rsep[0],rmax+1)
+    else: y = myFov.latFull[bmnum]
       
-      rmax = max(nrang[fplot])
-      data=numpy.zeros((len(times[fplot])*2,rmax))-150000
+    X, Y = numpy.meshgrid(xEdges, y)
+   
+    cmap,norm,bounds = plotUtils.genCmap(params[p],scales[p],colors=colors,lowGray=lowGray)
+    cmap.set_bad('w',1.0)
+    pcoll = ax.pcolormesh(X, Y, tmpdata.T, lw=0.01,edgecolors='None',alpha=1,cmap=cmap,norm=norm)
+    try:
+    	  cb = plotUtils.drawCB(rtiFig,pcoll,cmap,norm,map=0,pos=[pos[0]+pos[2]+.02, pos[1], 0.02, pos[3]])
+    except:
+    	  cb = rtiFig.colorbar(pcoll,orientation='vertical',shrink=.65,fraction=.1)
+    l = []
+    #define the colorbar labels
+    for i in range(0,len(bounds)):
+      l.append(str(int(bounds[i])))
+    cb.ax.set_yticklabels(l)
       
-      if gsct: 
-      	  gsdata=numpy.empty((len(times[fplot])*2,rmax))
-      x=numpy.empty(len(times[fplot])*2)
-      tcnt = 0
-
-      dt_list   = []
-      for i in range(len(times[fplot])):
-        x[tcnt]=date2num(times[fplot][i])
-        dt_list.append(times[fplot][i])
-
-        if(i < len(times[fplot])-1):
-          if(date2num(times[fplot][i+1])-x[tcnt] > 4./1440.):
-            tcnt += 1
-            x[tcnt] = x[tcnt-1]+1./1440.
-            dt_list.append(num2date(x[tcnt]))
-        tcnt += 1
-            
-        if(pArr[i] == []): continue
-        
-        if slist[fplot][i] != None :
-          for j in range(len(slist[fplot][i])):
-            if (not gsct or gsflg[fplot][i][j] == 0) or params[p] == 'power':
-              data[tcnt][int(slist[fplot][i][j])] = pArr[i][j]
-            elif gsct and gsflg[fplot][i][j] == 1:
-              data[tcnt][int(slist[fplot][i][j])] = -100000.
-      tmpdata = numpy.ma.masked_where(data <= -150000, data)
-
-      if (coords != 'gate' and coords != 'rng'):
-        if myFov is None:
-          site    = RadarPos(ids)
-          myFov   = radFov.fov(site=site,ngates=rmax,nbeams=site.maxbeam,rsep=rsep[fplot][0],coords=coords)
-        myLat   = myFov.latCenter[bmnum]
-        myLon   = myFov.lonCenter[bmnum]
-
-      if(coords == 'gate'): y = numpy.linspace(0,rmax,rmax+1)
-      elif(coords == 'rng'): y = numpy.linspace(frang[fplot][0],rmax*rsep[fplot][0],rmax+1)
-      else: y = myFov.latFull[bmnum]
-        
-      X, Y = numpy.meshgrid(x[:tcnt], y)
-     
-      cmap,norm,bounds = plotUtils.genCmap(params[p],scales[p],colors=colors,lowGray=lowGray)
-      cmap.set_bad('w',1.0)
-      pcoll = ax.pcolormesh(X, Y, tmpdata[:tcnt][:].T, lw=0.01,edgecolors='None',alpha=1,cmap=cmap,norm=norm)
-      try:
-      	  cb = plotUtils.drawCB(rtiFig,pcoll,cmap,norm,map=0,pos=[pos[0]+pos[2]+.02, pos[1], 0.02, pos[3]])
-      except:
-      	  cb = rtiFig.colorbar(pcoll,orientation='vertical',shrink=.65,fraction=.1)
-      l = []
-      #define the colorbar labels
-      for i in range(0,len(bounds)):
-        l.append(str(int(bounds[i])))
-      cb.ax.set_yticklabels(l)
-        
-      #set colorbar ticklabel size
-      for t in cb.ax.get_yticklabels():
-        t.set_fontsize(9)
-
-      #set colorbar label
-      if(params[p] == 'velocity'): cb.set_label('Velocity [m/s]',size=10)
-      if(params[p] == 'grid'): cb.set_label('Velocity [m/s]',size=10)
-      if(params[p] == 'power'): cb.set_label('Power [dB]',size=10)
-      if(params[p] == 'width'): cb.set_label('Spec Wid [m/s]',size=10)
-      if(params[p] == 'elevation'): cb.set_label('Elev [deg]',size=10)
-      if(params[p] == 'phi0'): cb.set_label('Phi0 [rad]',size=10)
-    #end of plotting for loop
-    return rtiFig
+    #set colorbar ticklabel size
+    for t in cb.ax.get_yticklabels():
+      t.set_fontsize(9)
+
+    #set colorbar label
+    if(params[p] == 'velocity'): cb.set_label('Velocity [m/s]',size=10)
+    if(params[p] == 'grid'): cb.set_label('Velocity [m/s]',size=10)
+    if(params[p] == 'power'): cb.set_label('Power [dB]',size=10)
+    if(params[p] == 'width'): cb.set_label('Spec Wid [m/s]',size=10)
+    if(params[p] == 'elevation'): cb.set_label('Elev [deg]',size=10)
+    if(params[p] == 'phi0'): cb.set_label('Phi0 [rad]',size=10)
+  #end of plotting for loop
+  return rtiFig
   
 def drawAxes(myFig,times,rad,cpid,bmnum,nrang,frang,rsep,bottom,ids,yrng=-1,\
 	coords='gate',pos=[.1,.05,.76,.72],xtick_size=9,\
@@ -0,0 +1,216 @@
+# memory mapped ring buffer of the time plot beam of a radar
+# one file per radar and beam holds the newest RING_SLOTS beams: a small
+# header, then every column as one contiguous block, the prm values as
+# (slots,) arrays and the fit values as (slots x RING_GATES) arrays with
+# NaN for gates without data. timeThread writes each beam into the slot
+# after the previous one in O(gates) and the time plot renders read the
+# window they draw straight from the mapped file, so memory stays the
+# same however long basic_gui runs and a restart carries on from the file.
+# The ring is sized for a day of beams at the cadence of the time plot
+# beam, ringSlots(), and gates past the ring's gates are not kept. A ring
+# opened with another size is resized, keeping its newest beams.
+
+import os
+import math
+import datetime
+import numpy as np
+from historyStore import HISTORY_DIR, epoch, readRecords, selectRecords
+
+# seconds of beams a ring is sized for
+RING_SECONDS = 86400
+# beams kept, a day of one beam every 10.5 seconds
+RING_SLOTS = 8192
+RING_GATES = 128
+
+MAGIC = 'RTIRING1'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('slots', '<u4'), ('gates', '<u4'), ('written', '<u8')])
+HEADER_SIZE = 64
+
+# column, dtype, attribute of the beam it comes from
+PRM_COLUMNS = (('time', '<f8', None), ('cp', '<i2', 'cp'), ('stid', '<i2', 'stid'), \
+	('nave', '<i2', 'prm.nave'), ('noisesky', '<f4', 'prm.noisesky'), \
+	('noisesearch', '<f4', 'prm.noisesearch'), ('tfreq', '<f4', 'prm.tfreq'), \
+	('ifmode', '<i2', 'prm.ifmode'), ('nrang', '<i2', 'prm.nrang'), \
+	('frang', '<i2', 'prm.frang'), ('rsep', '<i2', 'prm.rsep'))
+GATE_COLUMNS = (('velocity', '<f4', 'v'), ('power', '<f4', 'p_l'), ('width', '<f4', 'w_l'), \
+	('elevation', '<f4', 'elv'), ('phi0', '<f4', 'phi0'), ('gflg', '<f4', 'gflg'))
+
+def ringFile(name, bmnum, folder = HISTORY_DIR):
+	return os.path.join(folder, '%s_beam%d.rti' % (name, bmnum))
+
+'''
+Slots that hold RING_SECONDS of beams arriving every cadence seconds
+'''
+def ringSlots(cadence):
+	return int(math.ceil(RING_SECONDS / float(cadence)))
+
+def beamValue(myBeam, attr):
+	for part in attr.split('.'):
+		myBeam = getattr(myBeam, part)
+	return myBeam
+
+class RtiRing(object):
+	'''
+	Maps filenm, creating it with room for slots beams of gates gates
+	unless readonly. An existing file made with another size is resized
+	unless readonly, read only it keeps the size it was made with
+	'''
+	def __init__(self, filenm, slots = RING_SLOTS, gates = RING_GATES, readonly = False):
+		self.filenm = filenm
+		# beams put with gates past the ring's gates
+		self.clipped = 0
+		if not readonly and not os.path.exists(filenm):
+			create(filenm, slots, gates)
+		self.mm = np.memmap(filenm, dtype=np.uint8, mode='r' if readonly else 'r+')
+		self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.mm)
+		if self.header['magic'] != MAGIC:
+			raise IOError('%s is not an RTI ring' % (filenm))
+		if not readonly and (int(self.header['slots']), int(self.header['gates'])) != (slots, gates):
+			del self.header
+			del self.mm
+			resize(filenm, slots, gates)
+			self.mm = np.memmap(filenm, dtype=np.uint8, mode='r+')
+			self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.mm)
+		self.slots = int(self.header['slots'])
+		self.gates = int(self.header['gates'])
+		self.columns = {}
+		offset = HEADER_SIZE
+		for key, dtype, attr in PRM_COLUMNS + GATE_COLUMNS:
+			shape = (self.slots,) if (key, dtype, attr) in PRM_COLUMNS else (self.slots, self.gates)
+			self.columns[key] = np.ndarray(shape, dtype=dtype, buffer=self.mm, offset=offset)
+			offset += self.columns[key].nbytes
+
+	'''
+	Beams held, at most slots
+	'''
+	def count(self):
+		return min(int(self.header['written']), self.slots)
+
+	'''
+	Seconds of beams held, from the oldest to the newest, 0 when empty
+	'''
+	def span(self):
+		written = int(self.header['written'])
+		if written == 0:
+			return 0.
+		newest = self.columns['time'][(written - 1) % self.slots]
+		oldest = self.columns['time'][written % self.slots if written > self.slots else 0]
+		return float(newest - oldest)
+
+	'''
+	Writes a beam into the next slot, its time last so a render never
+	takes a half written slot for a new beam
+	'''
+	def put(self, myBeam):
+		written = int(self.header['written'])
+		slot = written % self.slots
+		for key, dtype, attr in PRM_COLUMNS[1:]:
+			self.columns[key][slot] = beamValue(myBeam, attr) or 0
+		slist = myBeam.fit.slist
+		if slist is not None and len(slist):
+			slist = np.asarray(slist, dtype=np.intp)
+			keep = slist < self.gates
+			slist = slist[keep]
+			if not keep.all():
+				self.clipped += 1
+		else:
+			slist = None
+		for key, dtype, attr in GATE_COLUMNS:
+			row = self.columns[key][slot]
+			row[:] = np.nan
+			values = getattr(myBeam.fit, attr, None)
+			if slist is not None and values is not None and len(values) == len(keep):
+				row[slist] = np.asarray(values, dtype=dtype)[keep]
+		self.columns['time'][slot] = epoch(myBeam.time)
+		self.header['written'] = written + 1
+
+	'''
+	Columns of the beams after timeThen, oldest first. They are views
+	into the file unless the window wraps around the end of the ring
+	'''
+	def window(self, timeThen):
+		written = int(self.header['written'])
+		count = min(written, self.slots)
+		first = written % self.slots if written > self.slots else 0
+		times = self.columns['time']
+		times = np.concatenate((times[first:count], times[:first]))
+		start = np.searchsorted(times, epoch(timeThen), 'right')
+		lo = (first + start) % self.slots
+		end = lo + count - start
+		window = {}
+		for key, column in self.columns.iteritems():
+			if end <= self.slots:
+				window[key] = column[lo:end]
+			else:
+				window[key] = np.concatenate((column[lo:], column[:end - self.slots]))
+		return window
+
+	def flush(self):
+		self.mm.flush()
+
+'''
+Writes an empty ring file next to filenm and renames it into place
+'''
+def create(filenm, slots, gates):
+	size = HEADER_SIZE + slots * sum(np.dtype(dtype).itemsize for key, dtype, attr in PRM_COLUMNS) + \
+		slots * gates * sum(np.dtype(dtype).itemsize for key, dtype, attr in GATE_COLUMNS)
+	tmp = filenm + '.tmp'
+	with open(tmp, 'wb') as f:
+		header = np.zeros((), dtype=HEADER_DTYPE)
+		header['magic'] = MAGIC
+		header['slots'] = slots
+		header['gates'] = gates
+		f.write(header.tobytes())
+		f.truncate(size)
+	os.rename(tmp, filenm)
+
+'''
+Makes the ring in filenm slots beams of gates gates long, keeping its
+newest beams and their first gates
+'''
+def resize(filenm, slots, gates):
+	window = RtiRing(filenm, readonly = True).window(datetime.datetime(1970, 1, 1))
+	count = min(len(window['time']), slots)
+	tmp = filenm + '.resize'
+	create(tmp, slots, gates)
+	ring = RtiRing(tmp, slots, gates)
+	for key, dtype, attr in PRM_COLUMNS:
+		ring.columns[key][:count] = window[key][len(window[key]) - count:]
+	for key, dtype, attr in GATE_COLUMNS:
+		keep = min(gates, window[key].shape[1])
+		ring.columns[key][:count] = np.nan
+		ring.columns[key][:count, :keep] = window[key][len(window[key]) - count:, :keep]
+	ring.header['written'] = count
+	ring.flush()
+	del ring
+	os.rename(tmp, filenm)
+
+'''
+Beam bmnum of radar name after timeThen up to timeNow from the history
+store, in the same columns as RtiRing.window, so plotRti can draw the
+time plot of any beam (historyRti.py). The gate values are scattered
+into the (beams x gates) arrays in one go, gates defaults to the
+largest nrang of the beams
+'''
+def historyWindow(name, bmnum, timeThen, timeNow, gates = None, folder = HISTORY_DIR):
+	records = readRecords(name, bmnum, timeThen, timeNow, folder)
+	prm = np.concatenate([dayPrm for dayPrm, dayGates in records])
+	if gates is None:
+		gates = int(prm['nrang'].max()) if len(prm) else RING_GATES
+	window = {}
+	for key, dtype, attr in PRM_COLUMNS:
+		window[key] = prm[key].astype(dtype)
+	for key, dtype, attr in GATE_COLUMNS:
+		window[key] = np.empty((len(prm), gates), dtype=dtype)
+		window[key][:] = np.nan
+	row = 0
+	for dayPrm, dayGates in records:
+		if len(dayPrm) == 0:
+			continue
+		dayPrm, values = selectRecords(dayPrm, dayGates, slice(None))
+		rows = np.repeat(np.arange(row, row + len(dayPrm)), dayPrm['npnts'].astype(np.intp))
+		keep = values['slist'] < gates
+		for key, dtype, attr in GATE_COLUMNS:
+			window[key][rows[keep], values['slist'][keep]] = values[attr][keep]
+		row += len(dayPrm)
+	return window
@@ -0,0 +1,77 @@
+# the scan drawn by the geo and fan plots of connection.py
+# the twisted client puts every beam into it, replacing the previous
+# beam of the same beam number, and the geo thread takes a consistent
+# snapshot of the whole scan when a render is due. Each beam number
+# has a version counter and beams put since the last snapshot are kept
+# in a dirty set, so a burst of beams is drawn in one render and a
+# render with nothing new is skipped.
+
+import datetime
+from davitpy.pydarn.sdio.radDataTypes import beamData
+from beamBuffers import BeamBuffer
+
+# highest beam number accepted
+MAX_BEAMS = 64
+
+class ScanState(BeamBuffer):
+	def __init__(self, myScan, maxbeams = MAX_BEAMS, **counters):
+		super(ScanState, self).__init__(**counters)
+		self.maxbeams = maxbeams
+		self.beams = dict((myBeam.bmnum, myBeam) for myBeam in myScan)
+		self.versions = dict((bmnum, 0) for bmnum in self.beams)
+		self.dirty = []
+		self.version = 0
+		self.newest = myScan[0]
+
+	def put(self, myBeam):
+		if not 0 <= myBeam.bmnum < self.maxbeams:
+			self.dropped.inc()
+			return
+		with self.lock:
+			if myBeam.bmnum in self.dirty:
+				self.dirty.remove(myBeam.bmnum)
+				self.coalesced.inc()
+			self.dirty.append(myBeam.bmnum)
+			self.beams[myBeam.bmnum] = myBeam
+			self.versions[myBeam.bmnum] = self.versions.get(myBeam.bmnum, 0) + 1
+			self.version += 1
+			self.newest = myBeam
+
+	'''
+	Newest beam put, or the first beam of the scan before any arrived
+	'''
+	def latest(self):
+		return self.newest
+
+	'''
+	Every beam held, for warm start snapshots
+	'''
+	def current(self):
+		with self.lock:
+			return self.beams.values()
+
+	'''
+	Returns (scan, changed, version) and clears the dirty set, or None when
+	no beam arrived since the last snapshot. scan is a list of beams indexed
+	by beam number, beam numbers never seen hold an empty beam, changed the
+	beams put since the last snapshot, oldest first.
+	'''
+	def snapshot(self):
+		with self.lock:
+			if not self.dirty:
+				return None
+			changed = [self.beams[bmnum] for bmnum in self.dirty]
+			self.dirty = []
+			beams = dict(self.beams)
+			version = self.version
+		timeNow = datetime.datetime.utcnow()
+		scan = []
+		for bmnum in range(max(beams) + 1):
+			if bmnum in beams:
+				scan.append(beams[bmnum])
+			else:
+				tmp_myBeam = beamData()
+				tmp_myBeam.bmnum = bmnum
+				tmp_myBeam.time = timeNow
+				scan.append(tmp_myBeam)
+		return scan, changed, version
@@ -0,0 +1,134 @@
+# render scheduling for the plotting threads in connection.py
+# the twisted client reports every beam it queues and the plotting
+# threads block in wait() until a render is due, instead of waking up
+# on a fixed timer. A render is due
+#   - coalesce seconds after the previous one once a beam has arrived,
+#     beams arriving in between are drawn together in one render
+#   - straight away when a scan completes, seen as prm.scan == 1 or
+#     the beam number returning to the first beam of the scan
+#   - staleness seconds after the previous one with no beams at all,
+#     so lost feeds are still noticed and drawn as such
+
+import time
+import logging
+from threading import Condition
+from eventLog import logEvent
+
+BEAM = 'beam'
+SCAN = 'scan'
+STALE = 'stale'
+STOP = 'stop'
+
+# seconds without a beam before a render happens anyway
+STALENESS = 60
+
+class RenderScheduler(object):
+	def __init__(self, name, coalesce, staleness = STALENESS, logger = None):
+		self.name = name
+		self.logger = logger or logging.getLogger()
+		self.coalesce = coalesce
+		self.staleness = staleness
+		self.cond = Condition()
+		self.reason = None
+		self.triggered = None
+		self.count = 0
+		self.lastRender = time.time()
+		# when the last render finished
+		self.lastDone = self.lastRender
+		self.stopped = False
+		self.firstBeam = None
+		self.beams = 0
+		# trigger to png latency of every render
+		self.renders = 0
+		self.latency = 0.
+		self.maxLatency = 0.
+		# the same since the last summary()
+		self.recent = (0, 0., 0.)
+
+	'''
+	Asks for a render, the time of the first trigger since the last
+	render is kept so the latency covers the whole coalesced burst
+	'''
+	def trigger(self, reason, now = None):
+		if now is None:
+			now = time.time()
+		with self.cond:
+			if self.triggered is None:
+				self.triggered = now
+				self.reason = reason
+			elif reason in (SCAN, STOP):
+				self.reason = reason
+			self.count += 1
+			self.cond.notify()
+
+	'''
+	Called for every beam queued, works out whether it completes a scan
+	'''
+	def beam(self, bmnum, scan = 0, now = None):
+		reason = BEAM
+		newScan = scan == 1 or bmnum == self.firstBeam
+		if newScan and self.beams > 0:
+			reason = SCAN
+			self.beams = 0
+		if newScan or self.firstBeam is None:
+			self.firstBeam = bmnum
+		self.beams += 1
+		self.trigger(reason, now)
+
+	def stop(self):
+		with self.cond:
+			self.stopped = True
+			self.cond.notify()
+
+	'''
+	Blocks until a render is due and returns (reason, first trigger time,
+	number of triggers coalesced), or None once stopped
+	'''
+	def wait(self):
+		with self.cond:
+			while not self.stopped:
+				now = time.time()
+				if self.triggered is None:
+					due = self.lastRender + self.staleness
+				elif self.reason in (SCAN, STOP):
+					due = now
+				else:
+					due = self.lastRender + self.coalesce
+				if now >= due:
+					if self.triggered is None:
+						trig = (STALE, now, 0)
+					else:
+						trig = (self.reason, self.triggered, self.count)
+					self.triggered = None
+					self.reason = None
+					self.count = 0
+					self.lastRender = now
+					return trig
+				self.cond.wait(due - now)
+			return None
+
+	'''
+	Records the trigger to png latency of a finished render, each
+	render is only logged at DEBUG, summary() aggregates them
+	'''
+	def done(self, trig):
+		reason, triggered, count = trig
+		self.lastDone = time.time()
+		latency = self.lastDone - triggered
+		self.renders += 1
+		self.latency += latency
+		self.maxLatency = max(self.maxLatency, latency)
+		with self.cond:
+			renders, total, maxLatency = self.recent
+			self.recent = (renders + 1, total + latency, max(maxLatency, latency))
+		logEvent(self.logger, logging.DEBUG, 'render', '%s render' % (self.name),
+			plot=self.name, reason=reason, triggers=count, latency=round(latency, 3))
+
+	'''
+	Renders, mean and max latency since the previous call
+	'''
+	def summary(self):
+		with self.cond:
+			renders, total, maxLatency = self.recent
+			self.recent = (0, 0., 0.)
+		return renders, total / renders if renders else 0., maxLatency
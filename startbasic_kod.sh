@@ -1,25 +1,44 @@
 #!/bin/sh
 SERVICE='basic_gui.py'
 RADAR='kodd'
+HEALTH="/var/www/radar/html/java/images/gui/errlog/health_$RADAR.json"
+#seconds a new basic_gui.py has to write its first health file
+GRACE=300
+if ! ps ax | grep -v grep | grep pydmap_daemon.py > /dev/null
+then
+    echo "pydmap_daemon.py is not running"
+    cd /var/www/radar/html/java/images/gui/
+    python2.7 pydmap_daemon.py &
+fi
 if ps ax | grep -v grep | grep $SERVICE | grep $RADAR > /dev/null
 then
-    cd /var/www/radar/html/java/images/gui/errlog/
-    filenm=$(ls -t err*|grep "$RADAR" | head -1)
-    echo "Latest $filenm"
-    lline=$(tail -1 "/var/www/radar/html/java/images/gui/errlog/$filenm")
-    echo "Last line of file: $lline"
-    if [[ "$lline" == *"Time thread stopped"* ]]
+    #basic_gui.py reconnects by itself, only restart it when it has hung
+    #and stopped writing its health file, or a plotting thread has died
+    #or stopped finishing renders. A new process gets GRACE seconds to
+    #build its maps and fill its ring before a missing file counts
+    ppid=$(ps -A -o pid,cmd|grep "$RADAR"|grep "$SERVICE" |head -n 1 | awk '{print $1}')
+    if [ ! -f "$HEALTH" ]
+    then
+        if [ "$(ps -o etimes= -p "$ppid" | tr -d ' ')" -gt "$GRACE" ] 2>/dev/null
+        then
+            echo "Killing $ppid, no $HEALTH after $GRACE seconds"
+            kill "$ppid"
+        fi
+    elif [ -n "$(find "$HEALTH" -mmin +2 2>/dev/null)" ]
+    then
+        echo "Killing $ppid, $HEALTH not updated for 2 minutes"
+        kill "$ppid"
+    elif grep -q -E '"status": "(dead|stuck)"' "$HEALTH" 2>/dev/null
     then
-        ppid=$(ps -A -o pid,cmd|grep "$RADAR"|grep "$SERVICE" |head -n 1 | awk '{print $1}')
-        echo "Killing $ppid"
+        echo "Killing $ppid, $HEALTH reports a dead or stuck plotting thread"
         kill "$ppid"
     fi
 else
     echo "$SERVICE is not running"
-    pkill -9 -f pydmap_read_kod.py
+    #the file of the previous process would get the new one killed
+    rm -f "$HEALTH"
     cd /var/www/radar/html/java/images/gui/
-    python2.7 pydmap_read_kod.py &
-    python2.7 basic_gui.py hosts=localhost ports=6044 maxbeam=16 nrangs=75 names="Kodiak D" beams=8 channels=d rad=kod filepath="kodd/"
+    python2.7 basic_gui.py hosts=localhost ports=6044 maxbeam=16 nrangs=75 names="Kodiak D" beams=8 channels=d rad=kod filepath="kodd/" health="errlog/health_$RADAR.json"
     
 fi
 
@@ -0,0 +1,61 @@
+# checks of dmapframe.encodeFrame and decodeFrame, every field of a
+# record has to come back from a frame with its value, type and shape
+# python2.7 test_dmapframe.py
+
+import numpy as np
+from dmapframe import encodeFrame, decodeFrame, LENGTH, ALIGN
+from pydmap import DTYPE_CODES, DATASTRING
+
+def roundTrip(scalars, vectors):
+	frame = encodeFrame(scalars, vectors)
+	length, = LENGTH.unpack_from(frame, 0)
+	assert length == len(frame) - LENGTH.size
+	assert len(frame) % ALIGN == 0
+	return decodeFrame(frame[LENGTH.size:])
+
+def test_scalars():
+	scalars = {}
+	for code, dtype in DTYPE_CODES.items():
+		if code != DATASTRING:
+			scalars['s%d' % (code)] = dtype.type(-3 if dtype.kind in 'if' else 3)
+	scalars['pi'] = np.float64(3.141592653589793)
+	scalars['noise'] = np.float32(1.5)
+	dic = roundTrip(scalars, {})
+	assert sorted(dic) == sorted(scalars)
+	for name, value in scalars.items():
+		assert dic[name] == value.item(), name
+		assert type(dic[name]) == type(value.item()), name
+
+def test_string_scalar():
+	dic = roundTrip({'origin':'ade', 'combf':'a longer string than eight bytes', 'empty':''}, {})
+	assert dic == {'origin':'ade', 'combf':'a longer string than eight bytes', 'empty':''}
+
+def test_vectors():
+	vectors = {'v':np.array([1.5, -2., 3.25], dtype='<f4'),
+		'slist':np.arange(5, dtype='<i2'),
+		'acfd':np.arange(2 * 3 * 4, dtype='<f4').reshape(2, 3, 4),
+		'ltab':np.array([[0, 0], [26, 27]], dtype='<i2'),
+		'elv':np.zeros(0, dtype='<f4')}
+	dic = roundTrip({'stid':np.int16(5)}, vectors)
+	assert dic['stid'] == 5
+	for name, value in vectors.items():
+		assert dic[name].dtype == value.dtype, name
+		assert dic[name].shape == value.shape, name
+		assert dic[name].tolist() == value.tolist(), name
+
+def test_mixed():
+	#fields of every kind one after another, so every offset gets padded
+	scalars = {'cp':np.int16(153), 'origin':'a', 'tfreq':np.int32(10500), 'c':np.int8(1)}
+	vectors = {'a':np.arange(3, dtype='<u1'), 'b':np.zeros(0, dtype='<i4'),
+		'd':np.arange(6, dtype='<f8').reshape(3, 2), 'e':np.arange(7, dtype='<i2')}
+	dic = roundTrip(scalars, vectors)
+	for name, value in scalars.items():
+		assert dic[name] == value, name
+	for name, value in vectors.items():
+		assert dic[name].tolist() == value.tolist(), name
+
+if __name__ == '__main__':
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+	print('ok')
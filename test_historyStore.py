@@ -0,0 +1,118 @@
+# checks of the day files and sparse time index of historyStore.py,
+# windows read through the index have to hold exactly the records a
+# scan of the whole day finds, in particular at the index block edges
+# python2.7 test_historyStore.py
+
+import os
+import shutil
+import datetime
+import tempfile
+import numpy as np
+from historyStore import PRM_DTYPE, INDEX_STRIDE, dayPrefix, appendArrays, \
+	readRecords, recordRange, readDay, newGates, selectRecords, epoch
+
+DAY = datetime.date(2020, 1, 1)
+START = epoch(datetime.datetime(2020, 1, 1))
+# seconds between records
+STEP = 10
+COUNT = 5 * INDEX_STRIDE + 7
+
+def records(first, count):
+	prm = np.zeros(count, dtype=PRM_DTYPE)
+	prm['time'] = START + STEP * np.arange(first, first + count)
+	prm['bmnum'] = 3
+	prm['npnts'] = np.arange(first, first + count) % 3
+	prm['offset'] = np.cumsum(prm['npnts']) - prm['npnts']
+	gates = newGates(int(prm['npnts'].sum()))
+	gates['slist'] = np.arange(len(gates))
+	gates['v'] = np.repeat(np.arange(first, first + count), prm['npnts'])
+	return prm, gates
+
+def dayFiles(folder):
+	prefix = dayPrefix('ade', DAY, 3, folder)
+	first = 0
+	#appended in uneven batches, as beams arrive
+	for count in (1, 63, 64, 100, 29, COUNT - 257):
+		prm, gates = records(first, count)
+		appendArrays(prefix, prm, gates)
+		first += count
+	return prefix
+
+def at(seconds):
+	return datetime.datetime.utcfromtimestamp(seconds)
+
+def window(folder, start, end):
+	prm = np.concatenate([dayPrm for dayPrm, dayGates in readRecords('ade', 3, at(start), at(end), folder)])
+	return prm['time'].tolist()
+
+def expected(start, end):
+	times = START + STEP * np.arange(COUNT)
+	return times[(times > start) & (times <= end)].tolist()
+
+def withFolder(test):
+	folder = tempfile.mkdtemp()
+	try:
+		test(folder)
+	finally:
+		shutil.rmtree(folder)
+
+def test_index():
+	def check(folder):
+		prefix = dayFiles(folder)
+		index = np.fromfile(prefix + '.tidx', dtype='<f8')
+		assert len(index) == -(-COUNT // INDEX_STRIDE)
+		assert index.tolist() == (START + STEP * np.arange(0, COUNT, INDEX_STRIDE)).tolist()
+	withFolder(check)
+
+def test_block_edges():
+	def check(folder):
+		dayFiles(folder)
+		for block in range(COUNT // INDEX_STRIDE + 1):
+			edge = START + STEP * block * INDEX_STRIDE
+			for start, end in ((edge, edge + 300), (edge - STEP, edge), (edge - 300, edge),
+					(edge, edge), (edge - STEP, edge + STEP), (edge + STEP, edge + 2000)):
+				assert window(folder, start, end) == expected(start, end), (block, start, end)
+	withFolder(check)
+
+def test_outside():
+	def check(folder):
+		dayFiles(folder)
+		last = START + STEP * (COUNT - 1)
+		#before the first record and after the last
+		assert window(folder, START - 3600, START - 1) == []
+		assert window(folder, START - 3600, START) == [START]
+		assert window(folder, last, last + 3600) == []
+		assert window(folder, last - 1, last + 3600) == [last]
+		assert window(folder, START - 3600, last + 3600) == expected(START - 1, last)
+	withFolder(check)
+
+def test_stale_index():
+	def check(folder):
+		prefix = dayFiles(folder)
+		#an index cut short is ignored by the reader and rebuilt by the next append
+		with open(prefix + '.tidx', 'r+b') as f:
+			f.truncate(8)
+		prm = readDay('ade', DAY, 3, folder)[0]
+		assert recordRange(prefix, prm, START + 100 * STEP, START + 200 * STEP) == (0, COUNT)
+		assert window(folder, START + 100 * STEP, START + 200 * STEP) == expected(START + 100 * STEP, START + 200 * STEP)
+		os.remove(prefix + '.tidx')
+		assert recordRange(prefix, prm, START, START) == (0, COUNT)
+		appendArrays(prefix, *records(COUNT, 1))
+		assert len(np.fromfile(prefix + '.tidx', dtype='<f8')) == -(-(COUNT + 1) // INDEX_STRIDE)
+	withFolder(check)
+
+def test_select_records():
+	prm, gates = records(0, 20)
+	rows = [3, 4, 10, 19]
+	sel, selGates = selectRecords(prm, gates, rows)
+	assert sel['offset'].tolist() == (np.cumsum(sel['npnts']) - sel['npnts']).tolist()
+	for row, rec in zip(rows, sel):
+		old = gates['v'][prm[row]['offset']:prm[row]['offset'] + prm[row]['npnts']]
+		new = selGates['v'][rec['offset']:rec['offset'] + rec['npnts']]
+		assert old.tolist() == new.tolist() == [row] * int(prm[row]['npnts'])
+
+if __name__ == '__main__':
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+	print('ok')
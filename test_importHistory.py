@@ -0,0 +1,55 @@
+# checks of importHistory.importFiles against a small old text history
+# file, the beams read back from the binary history have to hold the
+# values of its lines
+# python2.7 test_importHistory.py
+
+import os
+import shutil
+import datetime
+import tempfile
+from importHistory import importFiles
+from historyStore import readBeams
+
+START = datetime.datetime(2016, 3, 1, 23, 58, 3)
+
+'''
+Line n of the fixture as timeThread wrote it, a beam every 60 seconds
+with n + 1 gates
+'''
+def line(n):
+	slist = range(n + 1)
+	return ';'.join(['65', repr(START + datetime.timedelta(seconds=60 * n)), '153', '20', '1.5', '45', \
+		'75', '180', '2.0', '10500', repr(slist), '0', repr([10. * gate for gate in slist]), \
+		repr([3.] * len(slist)), repr([1.] * len(slist)), repr([gate % 2 for gate in slist])])
+
+def test_import():
+	folder = tempfile.mkdtemp()
+	try:
+		#the fixture crosses midnight, so it fills two days
+		filenm = os.path.join(folder, '312016_ade')
+		with open(filenm, 'w') as f:
+			f.write('\n'.join(line(n) for n in range(4)) + '\n')
+			f.write('a damaged line;\n')
+		importFiles([filenm], 7, 1, folder)
+		beams = readBeams('ade', 7, START - datetime.timedelta(seconds=1), START + datetime.timedelta(hours=1), folder)
+		assert [myBeam.time for myBeam in beams] == [START + datetime.timedelta(seconds=60 * n) for n in range(4)]
+		for n, myBeam in enumerate(beams):
+			assert (myBeam.stid, myBeam.bmnum, myBeam.cp) == (65, 7, 153)
+			assert (myBeam.prm.nave, myBeam.prm.rsep, myBeam.prm.nrang, myBeam.prm.frang) == (20, 45, 75, 180)
+			assert (myBeam.prm.noisesky, myBeam.prm.noisesearch, myBeam.prm.tfreq) == (1.5, 2.0, 10500)
+			assert list(myBeam.fit.slist) == range(n + 1)
+			assert list(myBeam.fit.v) == [10. * gate for gate in range(n + 1)]
+			assert list(myBeam.fit.p_l) == [3.] * (n + 1)
+			assert list(myBeam.fit.w_l) == [1.] * (n + 1)
+			assert list(myBeam.fit.gflg) == [gate % 2 for gate in range(n + 1)]
+		#a second import leaves the days it made alone
+		importFiles([filenm], 7, 1, folder)
+		assert len(readBeams('ade', 7, START - datetime.timedelta(seconds=1), START + datetime.timedelta(hours=1), folder)) == 4
+	finally:
+		shutil.rmtree(folder)
+
+if __name__ == '__main__':
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+	print('ok')
@@ -0,0 +1,66 @@
+# checks of jsonstream.JsonSplitter, every record has to come out once
+# and whole however the stream is cut into chunks
+# python2.7 test_jsonstream.py
+
+import json
+import random
+from jsonstream import JsonSplitter
+
+RECORDS = [json.dumps({'stid':65, 'v':[1.5, -2.0], 'origin':'a "quoted" {brace}'}),
+	json.dumps({'combnm':'ends in a backslash \\', 'slist':[]}),
+	json.dumps({'cp':153, 'note':'}{ \\" } \\\\'})]
+
+def feedChunks(chunks, splitter = None):
+	if splitter is None:
+		splitter = JsonSplitter()
+	msgs = []
+	for chunk in chunks:
+		msgs.extend(splitter.feed(chunk))
+	return msgs
+
+def test_every_split():
+	stream = RECORDS[0] + RECORDS[1]
+	for i in range(len(stream) + 1):
+		assert feedChunks([stream[:i], stream[i:]]) == RECORDS[:2], i
+
+def test_random_chunks():
+	rand = random.Random(7)
+	stream = ''.join(RECORDS * 20)
+	for trial in range(200):
+		chunks = []
+		pos = 0
+		while pos < len(stream):
+			n = rand.randint(1, 40)
+			chunks.append(stream[pos:pos + n])
+			pos += n
+		msgs = feedChunks(chunks)
+		assert msgs == RECORDS * 20
+		assert [json.loads(msg) for msg in msgs] == [json.loads(rec) for rec in RECORDS * 20]
+
+def test_bytes():
+	stream = ''.join(RECORDS)
+	splitter = JsonSplitter()
+	assert feedChunks(list(stream), splitter) == RECORDS
+	assert splitter.records == len(RECORDS)
+	assert splitter.discarded == 0
+
+def test_between_records():
+	splitter = JsonSplitter()
+	assert feedChunks(['\n', RECORDS[0], ' \n', RECORDS[1]], splitter) == RECORDS[:2]
+	assert splitter.discarded == 3
+
+def test_oversize():
+	big = json.dumps({'v':[1.0] * 1000})
+	splitter = JsonSplitter(maxlength = 100)
+	chunks = [big[i:i + 64] for i in range(0, len(big), 64)] + [RECORDS[0]]
+	assert feedChunks(chunks, splitter) == [RECORDS[0]]
+	assert splitter.dropped == 1
+	assert splitter.records == 1
+	#the buffer does not keep the dropped record
+	assert len(splitter.buf) < 200
+
+if __name__ == '__main__':
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+	print('ok')
@@ -0,0 +1,58 @@
+# checks of pydmap.parse_record against hand built record bytes, in
+# particular records that a misaligned or damaged feed can produce and
+# that pass the header check of DmapReader.sync()
+# python2.7 test_pydmap.py
+
+import struct
+from pydmap import parse_record, DATAINT, DATASHORT, DATASTRING
+
+def record(snum, anum, body):
+	return struct.pack('<iiii', 65537, 16 + len(body), snum, anum) + body
+
+def raises(exc, buf):
+	try:
+		parse_record(buf)
+	except exc:
+		return True
+	return False
+
+def test_good_record():
+	body = 'stid\0' + chr(DATASHORT) + struct.pack('<h', 5) + \
+		'origin\0' + chr(DATASTRING) + 'ade\0' + \
+		'v\0' + chr(DATAINT) + struct.pack('<ii', 1, 2) + struct.pack('<ii', -1, 2)
+	scalars, vectors = parse_record(record(2, 1, body))
+	assert scalars == {'stid':5, 'origin':'ade'}
+	assert vectors['v'].tolist() == [-1, 2]
+
+def test_name_ends_record():
+	#the NULL of the field name is the last byte of the record
+	buf = record(1, 0, 'abc\0')
+	assert len(buf) == 20
+	assert raises(ValueError, buf)
+
+def test_scalar_past_end():
+	assert raises(ValueError, record(1, 0, 'stid\0' + chr(DATAINT) + '\1\0'))
+
+def test_bad_ndims():
+	for ndims in (-1, 0):
+		body = 'v\0' + chr(DATAINT) + struct.pack('<i', ndims) + struct.pack('<ii', -1, 2)
+		assert raises(ValueError, record(0, 1, body))
+	#more dimensions than bytes left
+	body = 'v\0' + chr(DATAINT) + struct.pack('<ii', 1000, 2)
+	assert raises(ValueError, record(0, 1, body + '\0' * 8))
+
+def test_vector_past_end():
+	body = 'v\0' + chr(DATAINT) + struct.pack('<ii', 1, 3) + struct.pack('<ii', 1, 2)
+	assert raises(ValueError, record(0, 1, body))
+	body = 'v\0' + chr(DATAINT) + struct.pack('<ii', 1, -2)
+	assert raises(ValueError, record(0, 1, body))
+
+def test_unsupported_type():
+	assert raises(KeyError, record(1, 0, 'x\0' + chr(200) + '\0\0\0\0'))
+	assert raises(KeyError, record(0, 1, 'x\0' + chr(DATASTRING) + struct.pack('<ii', 1, 1) + 'a\0'))
+
+if __name__ == '__main__':
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+	print('ok')
@@ -0,0 +1,137 @@
+# checks of rtiRing.RtiRing, the ring has to hold the newest beams in
+# order however often it wraps and keep them through a resize
+# python2.7 test_rtiRing.py
+
+import os
+import shutil
+import datetime
+import tempfile
+import numpy as np
+from rtiRing import RtiRing, ringFile
+
+START = datetime.datetime(2020, 1, 1)
+SLOTS = 10
+GATES = 8
+
+class Values(object):
+	pass
+
+'''
+Beam n of the test, n seconds after START with velocity n at gates
+n % GATES and n % GATES + 5
+'''
+def beam(n):
+	myBeam = Values()
+	myBeam.time = START + datetime.timedelta(seconds=n)
+	myBeam.cp = 153
+	myBeam.stid = 5
+	myBeam.prm = Values()
+	for attr in ('nave', 'noisesky', 'noisesearch', 'tfreq', 'ifmode', 'nrang', 'frang', 'rsep'):
+		setattr(myBeam.prm, attr, n)
+	myBeam.fit = Values()
+	myBeam.fit.slist = [n % GATES, n % GATES + 5]
+	for attr in ('v', 'p_l', 'w_l', 'elv', 'phi0', 'gflg'):
+		setattr(myBeam.fit, attr, [n, -n])
+	return myBeam
+
+def at(n):
+	return START + datetime.timedelta(seconds=n)
+
+def withRing(test):
+	folder = tempfile.mkdtemp()
+	try:
+		test(ringFile('ade', 3, folder))
+	finally:
+		shutil.rmtree(folder)
+
+def test_wrap():
+	def check(filenm):
+		ring = RtiRing(filenm, SLOTS, GATES)
+		for n in range(SLOTS):
+			ring.put(beam(n))
+		assert ring.count() == SLOTS
+		assert ring.window(at(-1))['nrang'].tolist() == range(SLOTS)
+		#the next beam takes the slot of the oldest
+		ring.put(beam(SLOTS))
+		assert ring.count() == SLOTS
+		assert ring.columns['nrang'][0] == SLOTS
+		assert ring.window(at(-1))['nrang'].tolist() == range(1, SLOTS + 1)
+		assert ring.span() == SLOTS - 1
+		ring.put(beam(SLOTS + 1))
+		assert int(ring.header['written']) == SLOTS + 2
+		assert ring.window(at(-1))['nrang'].tolist() == range(2, SLOTS + 2)
+	withRing(check)
+
+def test_window_across_wrap():
+	def check(filenm):
+		ring = RtiRing(filenm, SLOTS, GATES)
+		for n in range(SLOTS + 4):
+			ring.put(beam(n))
+		#the oldest beam is in slot 4, the newest in slot 3
+		for then in range(2, SLOTS + 5):
+			window = ring.window(at(then))
+			wanted = range(max(then + 1, 4), SLOTS + 4)
+			assert window['nrang'].tolist() == wanted, then
+			assert window['velocity'].shape == (len(wanted), GATES)
+			for row, n in enumerate(wanted):
+				assert window['velocity'][row, n % GATES] == n
+				assert np.isnan(window['velocity'][row]).sum() == GATES - 2 + (n % GATES + 5 >= GATES)
+		#a window that does not wrap is a view into the file
+		window = ring.window(at(SLOTS))
+		assert window['nrang'].base is not None
+	withRing(check)
+
+def test_resize():
+	def check(filenm):
+		ring = RtiRing(filenm, SLOTS, GATES)
+		for n in range(SLOTS + 3):
+			ring.put(beam(n))
+		ring.flush()
+		del ring
+		#more slots and gates keep every beam and every gate
+		ring = RtiRing(filenm, 2 * SLOTS, 2 * GATES)
+		assert (ring.slots, ring.gates) == (2 * SLOTS, 2 * GATES)
+		window = ring.window(at(-1))
+		assert window['nrang'].tolist() == range(3, SLOTS + 3)
+		for row, n in enumerate(range(3, SLOTS + 3)):
+			assert window['velocity'][row, n % GATES] == n
+			#the second gate was past the 8 gates of the ring it was put in
+			kept = n % GATES + 5 < GATES
+			if kept:
+				assert window['velocity'][row, n % GATES + 5] == -n
+			assert np.isnan(window['velocity'][row]).sum() == 2 * GATES - 1 - kept
+		ring.put(beam(SLOTS + 3))
+		assert ring.window(at(-1))['nrang'].tolist() == range(3, SLOTS + 4)
+		ring.flush()
+		del ring
+		#fewer slots and gates keep the newest beams and their first gates
+		ring = RtiRing(filenm, 4, 4)
+		assert (ring.slots, ring.gates) == (4, 4)
+		window = ring.window(at(-1))
+		assert window['nrang'].tolist() == range(SLOTS, SLOTS + 4)
+		assert window['velocity'].shape == (4, 4)
+		for row, n in enumerate(range(SLOTS, SLOTS + 4)):
+			for gate in range(4):
+				value = window['velocity'][row, gate]
+				assert value == n if gate == n % GATES else np.isnan(value)
+		ring.put(beam(SLOTS + 4))
+		assert ring.window(at(-1))['nrang'].tolist() == range(SLOTS + 1, SLOTS + 5)
+		assert not os.path.exists(filenm + '.resize')
+	withRing(check)
+
+def test_clipped():
+	def check(filenm):
+		ring = RtiRing(filenm, SLOTS, 4)
+		ring.put(beam(1))
+		ring.put(beam(3))
+		#gates 6 and 8 are past the ring's 4 gates
+		assert ring.clipped == 2
+		window = ring.window(at(-1))
+		assert window['velocity'][1].tolist()[3] == 3
+	withRing(check)
+
+if __name__ == '__main__':
+	for name, test in sorted(globals().items()):
+		if name.startswith('test_'):
+			test()
+	print('ok')
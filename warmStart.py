@@ -0,0 +1,95 @@
+# warm start snapshots of basic_gui's live state
+# the beams of every radar's scan are saved every few minutes as two
+# numpy files, one row of prm values per beam and the gate values of
+# all beams one after another, and mapped back in at start up. The
+# time plot needs no snapshot, its RTI ring (rtiRing.py) is a file
+# already. The render workers pickle the site, map and fields of view
+# they build into the same folder so a restart does not rebuild them.
+
+import os
+import cPickle
+import numpy as np
+from historyStore import PRM_DTYPE, GATE_DTYPE, toArrays, fromArrays
+
+# seconds between snapshots
+WARM_INTERVAL = 300
+
+def warmPrefix(radar, kind):
+	return os.path.join(radar.warm[0], '%s%s_%s' % (radar.rad, radar.channels[0], kind))
+
+'''
+Writes an array next to its final name and renames it into place
+'''
+def writeArray(filenm, arr):
+	tmp = filenm + '.tmp'
+	with open(tmp, 'wb') as f:
+		np.save(f, arr)
+	os.rename(tmp, filenm)
+
+'''
+Saves the beams that hold fit data to <prefix>_prm.npy and <prefix>_gates.npy,
+in the records of historyStore.py
+'''
+def saveBeams(beams, prefix):
+	prm, gates = toArrays([myBeam for myBeam in beams \
+		if myBeam.fit.slist is not None and myBeam.time is not None])
+	writeArray(prefix + '_prm.npy', prm)
+	writeArray(prefix + '_gates.npy', gates)
+
+'''
+Maps a snapshot back in as a list of beams, empty if there is none
+or it was saved with other records
+'''
+def loadBeams(prefix):
+	try:
+		prm = np.load(prefix + '_prm.npy', mmap_mode='r')
+		gates = np.load(prefix + '_gates.npy', mmap_mode='r')
+	except (IOError, ValueError):
+		return []
+	if prm.dtype != PRM_DTYPE or gates.dtype != GATE_DTYPE:
+		return []
+	return fromArrays(prm, gates)
+
+'''
+Snapshots the scan of every radar
+'''
+def saveWarm(radars):
+	for radar in radars:
+		saveBeams(radar.scanState.current(), warmPrefix(radar, 'scan'))
+
+def mapFile(warm, key):
+	return os.path.join(warm, 'map_%s_%s_%s_%s.pickle' % key)
+
+'''
+Site, map, fields of view and dist a render worker saved for a
+radar and scan geometry, or None. A file that does not load, whatever
+the reason, is removed so the map is built and saved again
+'''
+def loadMap(warm, key):
+	filenm = mapFile(warm, key)
+	try:
+		with open(filenm, 'rb') as f:
+			return cPickle.load(f)
+	except IOError:
+		return None
+	except Exception:
+		try:
+			os.remove(filenm)
+		except OSError:
+			pass
+		return None
+
+'''
+Pickles a map next to its final name and renames it into place, the
+partly written file is removed if pickling fails
+'''
+def saveMap(warm, key, value):
+	filenm = mapFile(warm, key)
+	tmp = '%s.%d.tmp' % (filenm, os.getpid())
+	try:
+		with open(tmp, 'wb') as f:
+			cPickle.dump(value, f, cPickle.HIGHEST_PROTOCOL)
+	except Exception:
+		os.remove(tmp)
+		raise
+	os.rename(tmp, filenm)